@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the dustkid and Atlas endpoints used by
+`dfrandomizer.dataset`. Fixtures are read from a dataset directory, either a
+previously downloaded dataset or one written by `benchmarks.synthetic`, and
+served with configurable latency and error rates.
+
+Usage:
+
+python -m benchmarks.fake_server [--fixtures dataset] [--latency 0.05]
+python -m dfrandomizer.dataset --dustkid http://127.0.0.1:8555 \\
+    --atlas http://127.0.0.1:8555 --dataset /tmp/dataset
+"""
+import collections
+import http.server
+import json
+import logging
+import os
+import random
+import re
+import tempfile
+import threading
+import time
+from typing import Dict, List, Mapping, Sequence
+import urllib.parse
+
+from dfrandomizer.solverstore import SolverStore
+from dfrandomizer.util import ArgumentParser
+
+from .synthetic import generate_dataset
+
+LOGGER = logging.getLogger(__name__)
+
+# Keys that dfrandomizer.dataset derives itself and that therefore are not
+# part of the dustkid level listing.
+DERIVED_LEVEL_KEYS = (
+    "fastest_time",
+    "solvers_watermark",
+    "listing_hash",
+    "virtual",
+    "tiles",
+    "entities",
+)
+
+
+class Fixtures:
+    """
+    Upstream data served by the fake server, loaded from a dataset directory.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        with open(os.path.join(path, "levels.json"), "r") as flevels:
+            levels = json.load(flevels)
+        self.level_ids = sorted(levels)
+        self.listing = {
+            level_id: {
+                key: val
+                for key, val in leveldata.items()
+                if key not in DERIVED_LEVEL_KEYS
+            }
+            for level_id, leveldata in levels.items()
+        }
+        self.fastest_times = {
+            level_id: leveldata.get("fastest_time")
+            for level_id, leveldata in levels.items()
+        }
+
+        self.solvers = _load_solvers(path)
+
+    def scores(self, level_id: str) -> List[dict]:
+        """Return the charboard scores of a level. Each solver gets an SS
+        score no faster than the level's fastest time, interleaved with a
+        deterministic sprinkling of non-SS scores.
+        """
+        rng = random.Random(level_id)
+        fastest_time = self.fastest_times.get(level_id) or 10000
+        scores = []
+        for ind, player in enumerate(self.solvers.get(level_id, ())):
+            scores.append(
+                {
+                    "user": player,
+                    "score_completion": 5,
+                    "score_finesse": 5,
+                    "time": fastest_time + ind * 17,
+                }
+            )
+            if rng.random() < 0.25:
+                scores.append(
+                    {
+                        "user": player + 1,
+                        "score_completion": 5,
+                        "score_finesse": rng.randint(1, 4),
+                        "time": fastest_time,
+                    }
+                )
+        return scores
+
+    def file_path(self, subdir: str, name: str) -> str:
+        """Return the path of a fixture level file."""
+        return os.path.join(self.path, subdir, name)
+
+
+def _load_solvers(path: str) -> Mapping[str, Sequence[int]]:
+    """Load the solvers of a dataset from either storage format."""
+    try:
+        return SolverStore(os.path.join(path, "solvers.bin"))
+    except FileNotFoundError:
+        pass
+    try:
+        with open(os.path.join(path, "solvers.json"), "r") as fsolvers:
+            return json.load(fsolvers)
+    except FileNotFoundError:
+        return {}
+
+
+class FakeUpstream(http.server.ThreadingHTTPServer):
+    """
+    Threaded HTTP server answering dustkid and Atlas requests from
+    `fixtures`. Each request is delayed by `latency` seconds and fails with
+    `error_status` with probability `error_rate`.
+    """
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        address,
+        fixtures: Fixtures,
+        *,
+        latency: float = 0.0,
+        error_rate: float = 0.0,
+        error_status: int = 503,
+    ) -> None:
+        super().__init__(address, FakeUpstreamHandler)
+        self.fixtures = fixtures
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.stats: Dict[str, int] = collections.Counter()
+        self.stats_lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        """Root URL of the server."""
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def record(self, endpoint: str) -> None:
+        """Count a request to `endpoint`."""
+        with self.stats_lock:
+            self.stats[endpoint] += 1
+
+    def snapshot(self) -> Dict[str, int]:
+        """Return a copy of the request counts per endpoint."""
+        with self.stats_lock:
+            return dict(self.stats)
+
+
+class FakeUpstreamHandler(http.server.BaseHTTPRequestHandler):
+    """
+    Request handler for FakeUpstream.
+    """
+
+    protocol_version = "HTTP/1.1"
+    server: FakeUpstream
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        """Dispatch a GET request to its endpoint."""
+        url = urllib.parse.urlsplit(self.path)
+        query = dict(urllib.parse.parse_qsl(url.query))
+        self.server.record(url.path)
+
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        if random.random() < self.server.error_rate:
+            self.send_body(b"", status=self.server.error_status)
+            return
+
+        if url.path == "/levels.php":
+            self.send_json(self.levels(query))
+        elif url.path == "/charboard.php":
+            self.send_json(self.charboard(query))
+        elif url.path == "/backend8/level.php":
+            self.send_file("community_levels", re.sub(r"[^\w-]", "", query["id"]))
+        elif url.path == "/gi/downloader.php":
+            self.send_file("levels", str(int(query["id"])))
+        else:
+            self.send_body(b"", status=404)
+
+    def levels(self, query: Dict[str, str]) -> dict:
+        """Page through the level listing in level ID order."""
+        fixtures = self.server.fixtures
+        count = int(query.get("count", 1024))
+        prev = query.get("prev", "")
+        level_types = None
+        if query.get("level_type"):
+            level_types = {int(typ) for typ in query["level_type"].split(",")}
+        was_daily = None
+        if query.get("was_daily"):
+            was_daily = query["was_daily"] == "y"
+
+        page: Dict[str, dict] = {}
+        next_id = None
+        for level_id in fixtures.level_ids:
+            if level_id <= prev:
+                continue
+            leveldata = fixtures.listing[level_id]
+            if level_types is not None and leveldata["level_type"] not in level_types:
+                continue
+            if was_daily is not None and leveldata["was_daily"] != was_daily:
+                continue
+            if len(page) == count:
+                next_id = max(page)
+                break
+            page[level_id] = leveldata
+        return {"levels": page, "next": next_id}
+
+    def charboard(self, query: Dict[str, str]) -> dict:
+        """Return a page of a level's scoreboard."""
+        offset = int(query.get("offset", 0))
+        count = int(query.get("max", 1024))
+        scores = self.server.fixtures.scores(query["level"])
+        return {
+            "scores": {
+                str(offset + ind): score
+                for ind, score in enumerate(scores[offset : offset + count])
+            }
+        }
+
+    def send_json(self, data: dict) -> None:
+        """Send a JSON response."""
+        self.send_body(json.dumps(data).encode(), content_type="application/json")
+
+    def send_file(self, subdir: str, name: str) -> None:
+        """Send a fixture level file, or a 404 if it does not exist."""
+        try:
+            with open(self.server.fixtures.file_path(subdir, name), "rb") as fin:
+                body = fin.read()
+        except FileNotFoundError:
+            self.send_body(b"", status=404)
+            return
+        self.send_body(body, content_type="application/octet-stream")
+
+    def send_body(
+        self, body: bytes, *, status: int = 200, content_type: str = "text/plain"
+    ) -> None:
+        """Send a complete response with a keep-alive friendly body."""
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        LOGGER.debug(format, *args)
+
+
+def main():
+    """CLI entrypoint for the fake upstream server"""
+    parser = ArgumentParser(description="serve dataset fixtures as dustkid/Atlas")
+    parser.add_argument(
+        "--fixtures",
+        default=None,
+        required=False,
+        help="dataset folder to serve, defaults to a generated synthetic dataset",
+    )
+    parser.add_argument(
+        "--synthetic-levels",
+        default=500,
+        type=int,
+        required=False,
+        help="number of levels in the generated synthetic dataset",
+    )
+    parser.add_argument("--host", default="127.0.0.1", required=False)
+    parser.add_argument("--port", default=8555, type=int, required=False)
+    parser.add_argument(
+        "--latency",
+        default=0.0,
+        type=float,
+        required=False,
+        help="seconds to delay each response",
+    )
+    parser.add_argument(
+        "--error-rate",
+        default=0.0,
+        type=float,
+        required=False,
+        help="fraction of requests to fail",
+    )
+    parser.add_argument(
+        "--error-status",
+        default=503,
+        type=int,
+        required=False,
+        help="HTTP status of failed requests",
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        fixtures_path = args.fixtures
+        if fixtures_path is None:
+            LOGGER.info("Generating synthetic dataset in %s", tmpdir)
+            generate_dataset(tmpdir, num_levels=args.synthetic_levels)
+            fixtures_path = tmpdir
+
+        server = FakeUpstream(
+            (args.host, args.port),
+            Fixtures(fixtures_path),
+            latency=args.latency,
+            error_rate=args.error_rate,
+            error_status=args.error_status,
+        )
+        print(f"Serving {fixtures_path} on {server.url}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+Golden-output corpus for `dfrandomizer.randomizer.atlas_randomize`.
+
+Permalinks handed out by /generate-link encode only the dataset, nexus
+template, filter arguments and seed, so the randomizer must keep producing
+the same nexus for them. The corpus records a digest of the RandomizerData
+generated for a fixed set of such permalinks over synthetic datasets and
+every nexus template. `--record` rewrites the corpus from the current code,
+otherwise the current code is checked against it and timed.
+
+Usage:
+
+python -m benchmarks.golden_randomize [--record] [--templates nexus_templates]
+"""
+import hashlib
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Set
+
+from dfrandomizer.dataset import DatasetManager
+from dfrandomizer.nexus_templates import NexusTemplate, load_all_templates
+from dfrandomizer.randomizer import atlas_filter_levels, atlas_randomize
+from dfrandomizer.util import ArgumentParser
+
+from .synthetic import generate_randomizer_dataset
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(__file__), "golden_randomize.json")
+
+# Seeds of the synthetic datasets in the corpus.
+DATASET_SEEDS = (0, 1)
+
+# Level counts of the linear template in the corpus.
+LINEAR_SIZES = ("1", "7", "64", "256")
+
+# Permalinks recorded per dataset and template.
+CASES_PER_TEMPLATE = 4
+
+
+def load_dataset(path: str, seed: int, templates_dir: str) -> DatasetManager:
+    """Write the synthetic dataset with `seed` to `path`, including the
+    levels used by the templates in `templates_dir`, and load it the way the
+    web randomizer does.
+    """
+    template_levels: Set[str] = set()
+    for name in sorted(os.listdir(templates_dir)):
+        if name.endswith(".json"):
+            with open(os.path.join(templates_dir, name), "r") as fdata:
+                data = json.load(fdata)
+            template_levels.update(door["level"] for door in data["doors"].values())
+    generate_randomizer_dataset(path, extra_levels=template_levels, seed=seed)
+
+    dataset = DatasetManager(path)
+    dataset.load_levels()
+    dataset.load_solvers()
+    dataset.load_ranks()
+    dataset.load_community_levels()
+    dataset.load_banned_levels()
+    return dataset
+
+
+def random_args(rng: random.Random, dataset: DatasetManager) -> Dict[str, Any]:
+    """Return random atlas randomizer arguments as they appear in a
+    permalink, with dashes replaced by underscores.
+    """
+
+    def choice(*values: str) -> str:
+        return rng.choice(values)
+
+    args = {
+        "cmp_filter": choice("", "", "y", "n"),
+        "daily_filter": choice("", "", "y", "n"),
+        "community_filter": choice("", "", "", "n"),
+        "apple_filter": choice("", "", "y", "n"),
+        "cw_filter": choice("n", "n", ""),
+        "ccw_filter": choice("n", "n", ""),
+        "min_ss": choice("5", "0", "1", "20", ""),
+        "max_ss": choice("", "", "200", "-1"),
+        "min_time": choice("", "", "0:10.000", "5000"),
+        "max_time": choice("3:00.000", "3:00.000", "", "1:30.000"),
+        "min_difficulty": choice("0", "0", "250", "500", "900", "x"),
+        "max_difficulty": choice("1000", "1000", "750", "300", "100"),
+        "rand_doors": choice("", "", "y"),
+    }
+    if rng.random() < 0.2:
+        args["blocked_authors"] = ",".join(
+            f"author{rng.randint(0, 80)}" for _ in range(3)
+        )
+    if rng.random() < 0.2:
+        popular = [level for level, players in dataset.solvers.items() if players]
+        level = rng.choice(popular)
+        args["no_ss_users"] = str(rng.choice(dataset.solvers[level]))
+    return {key: val for key, val in args.items() if val}
+
+
+def case_digest(
+    dataset: DatasetManager, template: NexusTemplate, args: Dict[str, Any], seed: str
+) -> str:
+    """Return the digest of the nexus generated for a permalink, or the
+    error it fails with.
+    """
+    try:
+        nexus_data = atlas_randomize(
+            random.Random(seed), dataset, template.config(**args), **args
+        )
+    except (KeyError, ValueError) as exc:
+        return f"{type(exc).__name__}: {exc}"
+    return hashlib.sha256(
+        json.dumps(nexus_data.as_json(), sort_keys=True).encode()
+    ).hexdigest()
+
+
+def generate_cases(
+    seed: int, dataset: DatasetManager, templates: Dict[str, NexusTemplate]
+) -> List[dict]:
+    """Generate the permalinks recorded for the dataset with `seed`. Only
+    permalinks that /generate-link would accept are included, and at most
+    one permalink per template that fails to generate.
+    """
+    rng = random.Random(seed)
+    cases = []
+    for name, template in templates.items():
+        sizes = LINEAR_SIZES if name == "linear" else ("",)
+        for size in sizes:
+            failed = False
+            for _ in range(CASES_PER_TEMPLATE):
+                while True:
+                    args = random_args(rng, dataset)
+                    if size:
+                        args["num_levels"] = size
+                    configured = template.config(**args)
+                    count = len(atlas_filter_levels(dataset, configured, **args))
+                    if count < len(configured.level_doors):
+                        continue
+                    case_seed = str(rng.randrange(10 ** 9))
+                    digest = case_digest(dataset, template, args, case_seed)
+                    if ":" not in digest:
+                        break
+                    if not failed:
+                        failed = True
+                        break
+                cases.append(
+                    {
+                        "dataset": seed,
+                        "template": name,
+                        "args": args,
+                        "seed": case_seed,
+                    }
+                )
+    return cases
+
+
+def main():
+    """CLI entrypoint for the golden randomizer corpus"""
+    parser = ArgumentParser(description="check atlas_randomize against a corpus")
+    parser.add_argument(
+        "--corpus",
+        default=DEFAULT_CORPUS,
+        required=False,
+        help="golden corpus file",
+    )
+    parser.add_argument(
+        "--templates",
+        default="nexus_templates",
+        required=False,
+        help="nexus template folder",
+    )
+    parser.add_argument(
+        "--record",
+        action="store_true",
+        help="rewrite the corpus from the current randomizer",
+    )
+    args = parser.parse_args()
+
+    corpus: List[dict] = []
+    if not args.record:
+        with open(args.corpus, "r") as fcorpus:
+            corpus = json.load(fcorpus)
+
+    results = []
+    mismatches = 0
+    elapsed = 0.0
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for seed in DATASET_SEEDS:
+            dataset = load_dataset(
+                os.path.join(tmpdir, str(seed)), seed, args.templates
+            )
+            templates = load_all_templates(dataset, args.templates)
+
+            cases = [case for case in corpus if case["dataset"] == seed]
+            if args.record:
+                cases = generate_cases(seed, dataset, templates)
+
+            for case in cases:
+                start = time.perf_counter()
+                digest = case_digest(
+                    dataset, templates[case["template"]], case["args"], case["seed"]
+                )
+                elapsed += time.perf_counter() - start
+
+                if not args.record and digest != case["digest"]:
+                    mismatches += 1
+                    print(f"mismatch: {json.dumps(case)} got {digest}")
+                results.append(dict(case, digest=digest))
+
+    if args.record:
+        with open(args.corpus, "w") as fcorpus:
+            json.dump(results, fcorpus, indent=1)
+            fcorpus.write("\n")
+        print(f"Recorded {len(results)} cases to {args.corpus}")
+        return
+
+    print(
+        f"{len(results)} cases, {mismatches} mismatches, "
+        f"{elapsed / max(1, len(results)) * 1000:.2f}ms per atlas_randomize"
+    )
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
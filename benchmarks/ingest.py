@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+End-to-end benchmark of the `dfrandomizer.dataset` ingestion pipeline. Runs
+the full `dataset.main` pipeline into an empty dataset folder against a local
+fake dustkid/Atlas server and reports the wall time and request throughput
+of each stage.
+
+Usage:
+
+python -m benchmarks.ingest [--fixtures dataset] [--latency 0.02] [--workers 8]
+"""
+import os
+import tempfile
+import threading
+
+from dfrandomizer import dataset
+from dfrandomizer.util import ArgumentParser
+
+from .fake_server import FakeUpstream, Fixtures
+from .synthetic import generate_dataset
+
+
+def main():
+    """CLI entrypoint for the ingestion benchmark"""
+    parser = ArgumentParser(description="benchmark the dataset ingestion pipeline")
+    parser.add_argument(
+        "--fixtures",
+        default=None,
+        required=False,
+        help="dataset folder to serve, defaults to a generated synthetic dataset",
+    )
+    parser.add_argument(
+        "--synthetic-levels",
+        default=500,
+        type=int,
+        required=False,
+        help="number of levels in the generated synthetic dataset",
+    )
+    parser.add_argument(
+        "--latency",
+        default=0.02,
+        type=float,
+        required=False,
+        help="seconds the fake server delays each response",
+    )
+    parser.add_argument(
+        "--error-rate",
+        default=0.0,
+        type=float,
+        required=False,
+        help="fraction of requests the fake server fails",
+    )
+    parser.add_argument(
+        "--workers",
+        default=8,
+        type=int,
+        required=False,
+        help="concurrent requests made by the pipeline",
+    )
+    parser.add_argument(
+        "--processes",
+        default=1,
+        type=int,
+        required=False,
+        help="processes used by the pipeline to parse level files",
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        fixtures_path = args.fixtures
+        if fixtures_path is None:
+            fixtures_path = os.path.join(tmpdir, "fixtures")
+            generate_dataset(fixtures_path, num_levels=args.synthetic_levels)
+        dataset_path = os.path.join(tmpdir, "dataset")
+        os.mkdir(dataset_path)
+
+        server = FakeUpstream(
+            ("127.0.0.1", 0),
+            Fixtures(fixtures_path),
+            latency=args.latency,
+            error_rate=args.error_rate,
+        )
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+        results = []
+        last_stats = server.snapshot()
+
+        def stage_hook(stage: str, elapsed: float) -> None:
+            nonlocal last_stats
+            stats = server.snapshot()
+            requests = sum(stats.values()) - sum(last_stats.values())
+            results.append((stage, elapsed, requests))
+            last_stats = stats
+
+        try:
+            dataset.main(
+                [
+                    "--dustkid",
+                    server.url,
+                    "--atlas",
+                    server.url,
+                    "--dataset",
+                    dataset_path,
+                    "--workers",
+                    str(args.workers),
+                    "--processes",
+                    str(args.processes),
+                ],
+                stage_hook=stage_hook,
+            )
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    print(f"{'stage':<12} {'time':>9} {'requests':>9} {'req/s':>8}")
+    for stage, elapsed, requests in results:
+        rate = requests / elapsed if elapsed > 0 else 0.0
+        print(f"{stage:<12} {elapsed:>8.2f}s {requests:>9} {rate:>8.1f}")
+    total_time = sum(elapsed for _, elapsed, _ in results)
+    total_requests = sum(requests for _, _, requests in results)
+    print(
+        f"{'total':<12} {total_time:>8.2f}s {total_requests:>9} "
+        f"{total_requests / total_time:>8.1f}"
+    )
+
+
+if __name__ == "__main__":
+    main()
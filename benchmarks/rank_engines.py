@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Benchmark comparing the compute_ranks engines. Each engine after the first is
+checked to produce the same ranks as the first within a tight tolerance.
+Each acceleration scheme of the numpy engine is then checked to converge
+within an iteration cap to ranks close to those of the first engine.
+
+Usage:
+
+python -m benchmarks.rank_engines [--dataset dataset]
+"""
+import time
+
+from dfrandomizer.dataset import DatasetManager
+from dfrandomizer.playerrank import (
+    RANK_ACCELERATIONS,
+    RANK_ENGINES,
+    RankReport,
+    compute_ranks,
+)
+from dfrandomizer.util import ArgumentParser
+
+from .synthetic import generate_solvers
+
+TOLERANCE = 1e-9
+
+# Accelerated iterations stop at a different point within the convergence
+# tolerance, so they are only checked against this looser tolerance.
+ACCELERATION_TOLERANCE = 1e-5
+ACCELERATION_MAX_ITERATIONS = 1000
+
+
+def main():
+    """CLI entrypoint for the rank engine benchmark"""
+    parser = ArgumentParser(description="benchmark compute_ranks engines")
+    parser.add_argument(
+        "--dataset",
+        default=None,
+        required=False,
+        help="dataset folder to rank, defaults to synthetic solvers",
+    )
+    parser.add_argument("--levels", default=2000, type=int, required=False)
+    parser.add_argument("--players", default=10000, type=int, required=False)
+    parser.add_argument(
+        "--engines",
+        nargs="+",
+        default=["python", "numpy"],
+        choices=RANK_ENGINES,
+        required=False,
+    )
+    parser.add_argument(
+        "--accelerations",
+        nargs="+",
+        default=list(RANK_ACCELERATIONS),
+        choices=RANK_ACCELERATIONS,
+        required=False,
+    )
+    args = parser.parse_args()
+
+    if args.dataset is not None:
+        dataset = DatasetManager(args.dataset)
+        dataset.load_levels()
+        dataset.load_solvers()
+        levels, solvers = dataset.levels, dataset.solvers
+    else:
+        levels, solvers = generate_solvers(
+            num_levels=args.levels, num_players=args.players
+        )
+
+    baseline = None
+    print(f"{'engine':<22} {'time':>9} {'iters':>6} {'max error':>10}")
+    runs = [(engine, "none") for engine in args.engines]
+    runs.extend(
+        ("numpy", acceleration)
+        for acceleration in args.accelerations
+        if ("numpy", acceleration) not in runs
+    )
+    for engine, acceleration in runs:
+        report = RankReport()
+        start = time.perf_counter()
+        level_ranks, player_ranks = compute_ranks(
+            levels,
+            solvers,
+            engine=engine,
+            acceleration=acceleration,
+            max_iterations=ACCELERATION_MAX_ITERATIONS,
+            report=report,
+        )
+        elapsed = time.perf_counter() - start
+        name = f"{engine}/{acceleration}"
+        if not report.converged:
+            raise AssertionError(f"{name} did not converge")
+
+        error = 0.0
+        if baseline is None:
+            baseline = (level_ranks, player_ranks)
+        else:
+            error = max(
+                max(abs(level_ranks[key] - val) for key, val in baseline[0].items()),
+                max(abs(player_ranks[key] - val) for key, val in baseline[1].items()),
+            )
+            tolerance = TOLERANCE if acceleration == "none" else ACCELERATION_TOLERANCE
+            if not error <= tolerance:
+                raise AssertionError(f"{name} ranks differ by {error}")
+        print(f"{name:<22} {elapsed:>8.3f}s {len(report.iterations):>6} {error:>10.2e}")
+
+
+if __name__ == "__main__":
+    main()
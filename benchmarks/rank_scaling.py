@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Scaling benchmark for player ranking. For each scale point a power-law
+synthetic dataset is generated and `predict_sses` and `compute_ranks` are
+run on it, recording the time per iteration, the number of iterations and
+the peak memory traced by tracemalloc. Iteration timings come from the
+RankReport of each run.
+
+Timings are taken from a plain run and memory from a separate traced run as
+tracemalloc slows down allocation heavy code considerably.
+
+Usage:
+
+python -m benchmarks.rank_scaling [--players 10000 100000 1000000]
+"""
+import time
+import tracemalloc
+from typing import Callable, List, Optional, Tuple
+
+from dfrandomizer.playerrank import (
+    RANK_ACCELERATIONS,
+    RANK_ENGINES,
+    RankReport,
+    compute_ranks,
+    predict_sses,
+)
+from dfrandomizer.util import ArgumentParser
+
+from .synthetic import generate_power_law_solvers
+
+
+def traced_peak(func: Callable[[], object]) -> int:
+    """Return the peak memory in bytes traced while calling `func`."""
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run_scale_point(num_players: int, args) -> List[Tuple[str, float, float, int, int]]:
+    """Benchmark one scale point and return a row per function of
+    (name, total time, time per iteration, iterations, peak memory).
+    """
+    levels, solvers = generate_power_law_solvers(
+        num_players=num_players,
+        num_levels=round(args.levels_per_player * num_players),
+        mean_solvers=args.mean_solvers,
+        exponent=args.exponent,
+    )
+
+    def sses():
+        return predict_sses(levels, solvers)
+
+    def ranks(report: Optional[RankReport] = None):
+        return compute_ranks(
+            levels,
+            solvers,
+            engine=args.engine,
+            acceleration=args.acceleration,
+            max_iterations=args.max_iterations,
+            processes=args.processes,
+            report=report,
+        )
+
+    rows = []
+    start = time.perf_counter()
+    sses()
+    elapsed = time.perf_counter() - start
+    peak = 0 if args.skip_memory else traced_peak(sses)
+    rows.append(("predict_sses", elapsed, elapsed, 1, peak))
+
+    report = RankReport()
+    ranks(report)
+    iterations = report.iterations
+    peak = 0 if args.skip_memory else traced_peak(ranks)
+    rows.append(
+        (
+            "compute_ranks",
+            report.wall_time,
+            sum(iteration["time"] for iteration in iterations) / len(iterations),
+            len(iterations),
+            peak,
+        )
+    )
+    return rows
+
+
+def main():
+    """CLI entrypoint for the rank scaling benchmark"""
+    parser = ArgumentParser(description="benchmark player ranking at scale")
+    parser.add_argument(
+        "--players",
+        nargs="+",
+        default=[10000, 100000, 1000000],
+        type=int,
+        required=False,
+        help="number of players at each scale point",
+    )
+    parser.add_argument(
+        "--levels-per-player",
+        default=0.1,
+        type=float,
+        required=False,
+        help="number of levels per player at each scale point",
+    )
+    parser.add_argument(
+        "--mean-solvers",
+        default=50.0,
+        type=float,
+        required=False,
+        help="mean number of solvers drawn for each level",
+    )
+    parser.add_argument(
+        "--exponent",
+        default=1.0,
+        type=float,
+        required=False,
+        help="power law exponent of level popularity and player activity",
+    )
+    parser.add_argument(
+        "--engine", default="numpy", choices=RANK_ENGINES, required=False
+    )
+    parser.add_argument(
+        "--acceleration",
+        default="anderson",
+        choices=RANK_ACCELERATIONS,
+        required=False,
+    )
+    parser.add_argument("--max-iterations", default=None, type=int, required=False)
+    parser.add_argument(
+        "--processes",
+        default=1,
+        type=int,
+        required=False,
+        help="processes to compute ranks with, numpy engine only",
+    )
+    parser.add_argument(
+        "--skip-memory",
+        action="store_true",
+        help="skip the traced runs measuring peak memory",
+    )
+    args = parser.parse_args()
+    if args.engine == "python":
+        args.acceleration = "none"
+
+    print(
+        f"{'players':>8} {'function':<14} {'time':>9} {'per iter':>9} "
+        f"{'iters':>6} {'peak MiB':>9}"
+    )
+    for num_players in args.players:
+        for name, elapsed, per_iteration, iterations, peak in run_scale_point(
+            num_players, args
+        ):
+            print(
+                f"{num_players:>8} {name:<14} {elapsed:>8.3f}s "
+                f"{per_iteration:>8.3f}s {iterations:>6} {peak / 2**20:>9.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Benchmark comparing the streaming region scanner used by
+DatasetManager.extend_level_metadata against building full dustmaker `Level`
+objects for each region.
+
+Usage:
+
+python -m benchmarks.region_scan [nexus_templates/...]
+"""
+import collections
+import glob
+import os
+import time
+from typing import Callable, Dict, Tuple
+
+from dustmaker.dfreader import DFReader
+from dustmaker.level import Level
+
+from dfrandomizer.dataset import scan_level_histograms
+from dfrandomizer.util import ArgumentParser
+
+Histograms = Tuple[Dict, Dict]
+
+
+def level_histograms(level_path: str) -> Histograms:
+    """Reference implementation reading each region into a `Level`."""
+    tile_sets: Dict = collections.Counter()
+    entities: Dict = collections.Counter()
+    with DFReader(open(level_path, "rb")) as reader:
+        _, region_offsets = reader.read_level_ex()
+        for _ in region_offsets[:-1]:
+            level_data = Level()
+            reader.read_region(level_data)
+
+            for (layer, _, _), tile in level_data.tiles.items():
+                if layer != 19:
+                    continue
+                tile_sets[tile.sprite_set] += 1
+
+            for _, _, entity in level_data.entities.values():
+                entities[entity.etype] += 1
+
+    return dict(tile_sets), dict(entities)
+
+
+def scanner_histograms(level_path: str) -> Histograms:
+    """Streaming scanner implementation."""
+    with DFReader(open(level_path, "rb")) as reader:
+        _, region_offsets = reader.read_level_ex()
+        return scan_level_histograms(reader, region_offsets)
+
+
+def time_call(func: Callable[[str], Histograms], level_path: str, repeat: int):
+    """Return the best time of `repeat` calls and the result of the last one."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(level_path)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    """CLI entrypoint for the region scan benchmark"""
+    parser = ArgumentParser(description="benchmark level histogram extraction")
+    parser.add_argument(
+        "levels",
+        nargs="*",
+        help="level files to scan, defaults to the bundled nexus templates",
+    )
+    parser.add_argument(
+        "--repeat",
+        default=3,
+        type=int,
+        required=False,
+        help="number of timed runs per level, the best is reported",
+    )
+    args = parser.parse_args()
+
+    level_paths = args.levels or sorted(
+        path
+        for path in glob.glob(os.path.join("nexus_templates", "*"))
+        if not path.endswith(".json")
+    )
+
+    total_reference = 0.0
+    total_scanner = 0.0
+    print(f"{'level':<24} {'dustmaker':>10} {'scanner':>10} {'speedup':>8}")
+    for level_path in level_paths:
+        ref_time, ref_result = time_call(level_histograms, level_path, args.repeat)
+        scan_time, scan_result = time_call(scanner_histograms, level_path, args.repeat)
+        if ref_result != scan_result:
+            raise AssertionError(f"histogram mismatch for {level_path}")
+
+        total_reference += ref_time
+        total_scanner += scan_time
+        print(
+            f"{os.path.basename(level_path):<24} {ref_time:>9.3f}s {scan_time:>9.3f}s "
+            f"{ref_time / scan_time:>7.1f}x"
+        )
+
+    print(
+        f"{'total':<24} {total_reference:>9.3f}s {total_scanner:>9.3f}s "
+        f"{total_reference / total_scanner:>7.1f}x"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,320 @@
+"""
+Synthetic dataset fixtures for the benchmarks.
+
+Fixtures are written in the same layout as a dataset produced by
+`dfrandomizer.dataset` so that anything able to read a recorded dataset,
+such as the fake dustkid/Atlas server, can equally serve synthetic data:
+
+    levels.json        dustkid level listing plus "fastest_time"
+    solvers.bin        solver store of SS player IDs per level
+    levels/            Atlas level files by Atlas ID
+    community_levels/  dustkid community levels by scrubbed name
+
+`generate_randomizer_dataset` instead writes the derived files the
+randomizer loads (community.json, banned_levels.json and ranks.json) in
+place of the raw level files.
+"""
+import json
+import os
+import random
+import re
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+import numpy as np
+
+from dustmaker.dfwriter import DFWriter
+from dustmaker.entity import (
+    Apple,
+    EnemyKnight,
+    EnemySlimeBall,
+    EnemyTrashBall,
+    EnemyWolf,
+    LevelDoor,
+)
+from dustmaker.level import Level, LevelType
+from dustmaker.tile import Tile, TileSpriteSet
+
+from dfrandomizer.dataset import COMMUNITY_SUBTREES
+from dfrandomizer.level_sets import LEVELS_CMP
+from dfrandomizer.solverstore import write_solver_store
+
+ENEMY_TYPES = (EnemyKnight, EnemySlimeBall, EnemyTrashBall, EnemyWolf)
+SPRITE_SETS = (
+    TileSpriteSet.MANSION,
+    TileSpriteSet.FOREST,
+    TileSpriteSet.CITY,
+    TileSpriteSet.LABORATORY,
+    TileSpriteSet.TUTORIAL,
+)
+
+
+def write_level_file(
+    path: str,
+    name: str,
+    rng: random.Random,
+    *,
+    level_type: LevelType = LevelType.NORMAL,
+    doors: Sequence[str] = (),
+) -> None:
+    """Write a small level with random tiles and enemies to `path`. Nexus
+    levels get a level door for each name in `doors`.
+    """
+    level = Level()
+    level.level_type = level_type
+    level.name = name.encode()
+
+    sprite_set = rng.choice(SPRITE_SETS)
+    for x in range(rng.randint(20, 400)):
+        level.tiles[(19, x, rng.randint(0, 8))] = Tile(sprite_set=sprite_set)
+
+    for ind in range(rng.randint(0, 20)):
+        level.add_entity(ind * 48, 0, rng.choice(ENEMY_TYPES)())
+    if rng.random() < 0.2:
+        level.add_entity(0, -48, Apple())
+
+    for ind, door in enumerate(doors):
+        level_door = LevelDoor()
+        level_door.file_name = door.encode()
+        level.add_entity(ind * 96, 96, level_door)
+
+    with DFWriter(open(path, "wb")) as writer:
+        writer.write_level(level)
+
+
+def generate_dataset(
+    path: str,
+    *,
+    num_levels: int = 500,
+    num_players: int = 2000,
+    num_community: int = 50,
+    seed: int = 0,
+) -> None:
+    """Write a synthetic dataset fixture to the directory `path`.
+
+    The fixture contains `num_levels` listed Atlas levels solved by a random
+    subset of `num_players` players, plus a community nexus linking to
+    `num_community` unlisted community levels and a sample of the listed
+    levels. The Atlas levels of the stock CMP level set are also written so
+    that the community crawl can resolve them.
+    """
+    rng = random.Random(seed)
+    os.makedirs(os.path.join(path, "levels"), exist_ok=True)
+    os.makedirs(os.path.join(path, "community_levels"), exist_ok=True)
+
+    levels: Dict[str, dict] = {}
+    solvers: Dict[str, List[int]] = {}
+    for ind in range(num_levels):
+        atlas_id = 10000 + ind
+        level_id = f"synthetic{ind}-{atlas_id}"
+        name = f"Synthetic {ind}"
+        write_level_file(os.path.join(path, "levels", str(atlas_id)), name, rng)
+
+        level_solvers = rng.sample(
+            range(1, num_players + 1), rng.randint(0, max(1, num_players // 10))
+        )
+        levels[level_id] = {
+            "name": name,
+            "author": f"author{rng.randint(0, 50)}",
+            "atlas_id": atlas_id,
+            "level_type": int(LevelType.NORMAL),
+            "was_daily": rng.random() < 0.05,
+            "fastest_time": rng.randint(5000, 120000) if level_solvers else None,
+        }
+        solvers[level_id] = level_solvers
+
+    for level_id in LEVELS_CMP:
+        atlas_id = int(level_id.rsplit("-", 1)[1])
+        write_level_file(os.path.join(path, "levels", str(atlas_id)), level_id, rng)
+
+    community = [f"community{ind}" for ind in range(num_community)]
+    for level in community:
+        write_level_file(_community_path(path, level), level, rng)
+    write_level_file(
+        _community_path(path, "customnexus"),
+        "customnexus",
+        rng,
+        level_type=LevelType.NEXUS,
+        doors=community + rng.sample(list(levels), min(len(levels), 16)),
+    )
+    write_level_file(
+        _community_path(path, "Multiplayer Nexus"),
+        "Multiplayer Nexus",
+        rng,
+        level_type=LevelType.NEXUS,
+        doors=("customnexus", "Main Nexus"),
+    )
+
+    with open(os.path.join(path, "levels.json"), "w") as flevels:
+        json.dump(levels, flevels)
+    write_solver_store(os.path.join(path, "solvers.bin"), solvers)
+
+
+def _community_path(path: str, level: str) -> str:
+    """Return the path a community level is stored at in a dataset."""
+    return os.path.join(path, "community_levels", re.sub(r"[^\w-]", "", level))
+
+
+def generate_randomizer_dataset(
+    path: str,
+    *,
+    num_levels: int = 2000,
+    num_players: int = 5000,
+    extra_levels: Iterable[str] = (),
+    seed: int = 0,
+) -> None:
+    """Write a synthetic dataset with everything the web randomizer loads to
+    the directory `path`, without any level files.
+
+    The dataset has `num_levels` Atlas levels plus the stock CMP levels and
+    `extra_levels`, such as the levels of the nexus templates. Extra levels
+    ending in an Atlas ID are treated as Atlas levels, the rest as stock
+    levels. Only Python's `random` module is used so that the same `seed`
+    gives the same dataset everywhere. Level ranks are rounded for a share
+    of the levels so that some ranks tie, and one level with solvers is left
+    unranked.
+    """
+    rng = random.Random(seed)
+    os.makedirs(path, exist_ok=True)
+
+    level_ids = [f"synthetic{ind}-{10000 + ind}" for ind in range(num_levels)]
+    level_ids.extend(sorted(set(LEVELS_CMP) | set(extra_levels) - {""}))
+
+    levels: Dict[str, dict] = {}
+    solvers: Dict[str, List[int]] = {}
+    for level_id in level_ids:
+        match = re.search(r"-(\d+)$", level_id)
+        atlas_id = int(match.group(1)) if match else 0
+        level_solvers = []
+        if atlas_id:
+            level_solvers = rng.sample(
+                range(1, num_players + 1), min(num_players, int(rng.paretovariate(0.7)))
+            )
+            solvers[level_id] = level_solvers
+        entities = {"enemy_knight": rng.randint(0, 20)}
+        if rng.random() < 0.2:
+            entities["hittable_apple"] = 1
+        levels[level_id] = {
+            "name": level_id,
+            "author": f"Author{rng.randint(0, 80)}",
+            "atlas_id": atlas_id,
+            "level_type": int(LevelType.NORMAL),
+            "was_daily": rng.random() < 0.05,
+            "fastest_time": rng.randint(3000, 300000) if level_solvers else None,
+            "entities": entities,
+        }
+
+    def community_tree(size: int) -> Dict[str, dict]:
+        return {level: {} for level in rng.sample(level_ids, size)}
+
+    community = community_tree(100)
+    for subtree in COMMUNITY_SUBTREES:
+        community[subtree] = community_tree(40)
+
+    unranked = rng.choice(
+        [level for level, players in solvers.items() if len(players) >= 5]
+    )
+    level_ranks = {}
+    for level_id in level_ids:
+        if level_id == unranked:
+            continue
+        rank = rng.random()
+        level_ranks[level_id] = round(rank, 2) if rng.random() < 0.3 else rank
+
+    with open(os.path.join(path, "levels.json"), "w") as flevels:
+        json.dump(levels, flevels)
+    write_solver_store(os.path.join(path, "solvers.bin"), solvers)
+    with open(os.path.join(path, "community.json"), "w") as fcommunity:
+        json.dump({"customnexus": community}, fcommunity)
+    with open(os.path.join(path, "banned_levels.json"), "w") as fbanned:
+        json.dump(rng.sample(level_ids, 20), fbanned)
+    with open(os.path.join(path, "ranks.json"), "w") as franks:
+        json.dump(
+            {"level_ranks": level_ranks, "player_ranks": {}, "gen_time": seed + 1},
+            franks,
+        )
+
+
+def generate_solvers(
+    *, num_levels: int = 2000, num_players: int = 10000, seed: int = 0
+) -> Tuple[Dict[str, dict], Dict[str, List[int]]]:
+    """Return in-memory `levels` and `solvers` mappings suitable for
+    `dfrandomizer.playerrank.compute_ranks`.
+    """
+    rng = random.Random(seed)
+    levels: Dict[str, dict] = {}
+    solvers: Dict[str, List[int]] = {}
+    for ind in range(num_levels):
+        atlas_id = 10000 + ind
+        level_id = f"synthetic{ind}-{atlas_id}"
+        levels[level_id] = {
+            "atlas_id": atlas_id,
+            "was_daily": rng.random() < 0.05,
+        }
+        solvers[level_id] = rng.sample(
+            range(1, num_players + 1), rng.randint(0, max(1, num_players // 10))
+        )
+    return levels, solvers
+
+
+def generate_power_law_solvers(
+    *,
+    num_players: int = 10000,
+    num_levels: int = 0,
+    mean_solvers: float = 50.0,
+    exponent: float = 1.0,
+    daily_fraction: float = 0.05,
+    seed: int = 0,
+) -> Tuple[Dict[str, dict], Dict[str, List[int]]]:
+    """Return in-memory `levels` and `solvers` mappings shaped like dustkid's.
+
+    Unlike `generate_solvers` both the number of solvers per level and the
+    number of levels solved per player follow a power law with the given
+    `exponent`, so a few levels and players account for most of the solves.
+    Atlas IDs are increasing with random gaps and older levels, as well as
+    the `daily_fraction` of levels that were a daily, have more solvers.
+    `num_levels` defaults to one level per 10 players. Each level draws
+    `mean_solvers` solvers on average, fewer remain once repeated draws of
+    the most active players are dropped.
+    """
+    rng = np.random.default_rng(seed)
+    if num_levels <= 0:
+        num_levels = max(1, num_players // 10)
+
+    atlas_ids = 1000 + np.cumsum(rng.integers(1, 4, size=num_levels))
+    was_daily = rng.random(num_levels) < daily_fraction
+
+    popularity = rng.permutation(_zipf_weights(num_levels, exponent))
+    popularity *= np.linspace(1.5, 0.5, num_levels)
+    popularity[was_daily] *= 3.0
+    counts = np.minimum(
+        np.rint(popularity * (mean_solvers * num_levels / popularity.sum())),
+        num_players,
+    ).astype(np.int64)
+
+    # Draw each level's solvers with replacement, weighted by player activity,
+    # then drop repeated draws of the same player.
+    activity = np.cumsum(rng.permutation(_zipf_weights(num_players, exponent)))
+    edge_levels = np.repeat(np.arange(num_levels, dtype=np.int64), counts)
+    edge_players = np.searchsorted(
+        activity, rng.random(len(edge_levels)) * activity[-1], side="right"
+    )
+    edges = np.unique(edge_levels * num_players + edge_players)
+    edge_levels, edge_players = np.divmod(edges, num_players)
+    splits = np.searchsorted(edge_levels, np.arange(1, num_levels))
+
+    levels: Dict[str, dict] = {}
+    solvers: Dict[str, List[int]] = {}
+    for ind, level_solvers in enumerate(np.split(edge_players + 1, splits)):
+        atlas_id = int(atlas_ids[ind])
+        level_id = f"synthetic{ind}-{atlas_id}"
+        levels[level_id] = {
+            "atlas_id": atlas_id,
+            "was_daily": bool(was_daily[ind]),
+        }
+        solvers[level_id] = level_solvers.tolist()
+    return levels, solvers
+
+
+def _zipf_weights(size: int, exponent: float) -> np.ndarray:
+    """Return Zipf weights 1 / rank ** exponent for ranks 1 to `size`."""
+    return np.power(np.arange(1, size + 1, dtype=np.float64), -exponent)
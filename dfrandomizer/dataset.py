@@ -4,22 +4,55 @@ Module for managing a randomizer dataset.
 """
 import argparse
 import collections
+import concurrent.futures
+import datetime
+import email.utils
 import json
 import logging
 import os
+import random
 import re
+import struct
+import threading
 import time
-from typing import Dict, List, Optional, Set, Tuple
+import zlib
+from typing import (
+    AbstractSet,
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Mapping,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+)
 import urllib
 
 from dustmaker.entity import LevelDoor, CustomScoreBook
 from dustmaker.dfreader import DFReader
-from dustmaker.level import Level, LevelType
+from dustmaker.level import LevelType
 from dustmaker.tile import TileSpriteSet
+from dustmaker.variable import VariableType
 import requests
 
 from .level_sets import LEVELS_CMP
-from .playerrank import compute_ranks
+from .journal import DatasetJournal
+from .level_index import COMMUNITY_SUBTREE_FILTERS, LevelIndex
+from .playerrank import (
+    DEFAULT_TOLERANCE,
+    DEFAULT_TRUNCATION_ERROR,
+    RANK_ACCELERATIONS,
+    RANK_ENGINES,
+    REGRESSION_MODELS,
+    RankReport,
+    compute_ranks,
+    update_ranks,
+)
+from .solverstore import SolverStore, write_solver_store
 from .util import open_and_swap
 
 LOGGER = logging.getLogger(__name__)
@@ -27,11 +60,236 @@ LOGGER = logging.getLogger(__name__)
 DEFAULT_DUSTKID_ROOT = "https://dustkid.com"
 DEFAULT_ATLAS_ROOT = "http://atlas.dustforce.com"
 
+# Retry policy for requests to dustkid and Atlas. Retries back off
+# exponentially from HTTP_BACKOFF_BASE seconds up to HTTP_BACKOFF_MAX seconds.
+HTTP_MAX_ATTEMPTS = 5
+HTTP_BACKOFF_BASE = 1.0
+HTTP_BACKOFF_MAX = 60.0
+HTTP_RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+# Seconds to wait for a connection or for data before giving up on a request.
+HTTP_TIMEOUT = 60.0
+
+# Number of journal records to accumulate before compacting the journal into
+# levels.json and solvers.bin.
+JOURNAL_COMPACT_RECORDS = 5000
+
+# Minimum number of seconds between download progress reports.
+PROGRESS_REPORT_INTERVAL = 10.0
+
+# Solver lists older than their TTL are refreshed at a per-level point between
+# this fraction of the TTL and the full TTL. This staggers refreshes so that
+# levels fetched in the same run do not all go stale on the same night.
+SOLVERS_TTL_JITTER = 0.5
+
 LevelMetaMapping = Dict[str, dict]
-SolverMapping = Dict[str, List[int]]
+SolverMapping = Mapping[str, Sequence[int]]
+
+# Nexuses within the community tree whose levels are tracked separately so
+# that they can be filtered on by the randomizer.
+COMMUNITY_SUBTREES = tuple(COMMUNITY_SUBTREE_FILTERS.values())
+
+
+class _CommunityNode(NamedTuple):
+    """
+    Result of crawling a level reachable from the community nexus. Normal
+    levels carry their level metadata, nexuses the levels they link to.
+    """
+
+    leveldata: Optional[dict]
+    sub_levels: List[str]
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket allowing `rate` acquisitions per second on
+    average with bursts of up to `burst` acquisitions. If `rate` is None
+    acquisitions are only delayed by calls to `defer`.
+    """
+
+    def __init__(self, rate: Optional[float], burst: int = 1) -> None:
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.last_refill = time.monotonic()
+        self.blocked_until = 0.0
+        self.lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """Block until a token is available and consume it."""
+        with self.lock:
+            now = time.monotonic()
+            delay = max(0.0, self.blocked_until - now)
+            if self.rate is not None:
+                self.tokens = min(
+                    self.burst, self.tokens + (now - self.last_refill) * self.rate
+                )
+                self.last_refill = now
+
+                # Reserve the token immediately so that concurrent callers
+                # queue up behind each other, then sleep off any deficit.
+                self.tokens -= 1
+                if self.tokens < 0:
+                    delay = max(delay, -self.tokens / self.rate)
+        if delay > 0:
+            time.sleep(delay)
+
+    def defer(self, delay: float) -> None:
+        """Hold off all acquisitions for at least `delay` seconds."""
+        with self.lock:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + delay)
+
+
+class RateLimiter:
+    """
+    Applies an independent token bucket rate limit to each host.
+    """
+
+    def __init__(self, rate: Optional[float], burst: int = 1) -> None:
+        self.rate = rate
+        self.burst = burst
+        self.buckets: Dict[str, TokenBucket] = {}
+        self.lock = threading.Lock()
+
+    def bucket(self, url: str) -> TokenBucket:
+        """Return the token bucket for the host of `url`."""
+        host = urllib.parse.urlsplit(url).netloc
+        with self.lock:
+            bucket = self.buckets.get(host)
+            if bucket is None:
+                bucket = TokenBucket(self.rate, self.burst)
+                self.buckets[host] = bucket
+        return bucket
+
+    def acquire(self, url: str) -> None:
+        """Block until a request to the host of `url` is allowed."""
+        self.bucket(url).acquire()
+
+
+class HttpClient:
+    """
+    HTTP client shared by all dataset downloads. Requests reuse pooled
+    connections, are rate limited per host, and are retried with exponential
+    backoff and full jitter on connection errors and transient statuses.
+
+    When a host responds with a `Retry-After` header, or is otherwise
+    throttling requests, the whole host is paused rather than just the
+    failing request so that concurrent workers back off together.
+    """
+
+    def __init__(
+        self,
+        *,
+        rate_limit: Optional[float] = None,
+        max_attempts: int = HTTP_MAX_ATTEMPTS,
+        backoff_base: float = HTTP_BACKOFF_BASE,
+        backoff_max: float = HTTP_BACKOFF_MAX,
+        timeout: float = HTTP_TIMEOUT,
+    ) -> None:
+        self.sess = requests.Session()
+        self.rate_limiter = RateLimiter(rate_limit)
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+        self.pool_size = 0
+        self.resize_pool(1)
+
+    def resize_pool(self, workers: int) -> None:
+        """Size the connection pool so that `workers` threads can share it
+        without discarding connections.
+        """
+        workers = max(1, workers)
+        if workers <= self.pool_size:
+            return
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=workers, pool_maxsize=workers
+        )
+        self.sess.mount("http://", adapter)
+        self.sess.mount("https://", adapter)
+        self.pool_size = workers
+
+    def get(
+        self,
+        url: str,
+        *,
+        stream: bool = False,
+        retry_statuses: AbstractSet[int] = HTTP_RETRY_STATUSES,
+        accept_statuses: AbstractSet[int] = frozenset(),
+    ) -> requests.Response:
+        """Perform a GET request, retrying transient failures. Responses with
+        a status in `accept_statuses` are returned to the caller rather than
+        raised as errors.
+        """
+        bucket = self.rate_limiter.bucket(url)
+        for attempt in range(self.max_attempts):
+            last_attempt = attempt + 1 == self.max_attempts
+            bucket.acquire()
+            try:
+                resp = self.sess.get(url, stream=stream, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as exc:
+                if last_attempt:
+                    raise
+                delay = self._backoff(attempt)
+                LOGGER.warning(
+                    "Request to %s failed (%s), retrying in %.1fs", url, exc, delay
+                )
+                time.sleep(delay)
+                continue
 
+            if resp.ok or resp.status_code in accept_statuses:
+                return resp
+            if last_attempt or resp.status_code not in retry_statuses:
+                resp.close()
+                resp.raise_for_status()
 
-class DatasetManager:
+            retry_after = _parse_retry_after(resp.headers.get("Retry-After"))
+            resp.close()
+            if retry_after is not None:
+                delay = min(retry_after, self.backoff_max)
+                bucket.defer(delay)
+            else:
+                delay = self._backoff(attempt)
+                if resp.status_code in (429, 503):
+                    bucket.defer(delay)
+            LOGGER.warning(
+                "Request to %s returned %d, retrying in %.1fs",
+                url,
+                resp.status_code,
+                delay,
+            )
+            time.sleep(delay)
+
+        raise AssertionError("unreachable")
+
+    def _backoff(self, attempt: int) -> float:
+        """Return a randomized delay before retry number `attempt + 1`."""
+        return random.uniform(
+            0, min(self.backoff_max, self.backoff_base * 2 ** attempt)
+        )
+
+
+def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header value into a delay in seconds."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_time = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_time.tzinfo is None:
+        retry_time = retry_time.replace(tzinfo=datetime.timezone.utc)
+    return max(
+        0.0,
+        (retry_time - datetime.datetime.now(datetime.timezone.utc)).total_seconds(),
+    )
+
+
+class DatasetManager:  # pylint: disable=too-many-instance-attributes
     """
     Class managing a dataset.
     """
@@ -42,16 +300,31 @@ class DatasetManager:
         *,
         dustkid_root: str = DEFAULT_DUSTKID_ROOT,
         atlas_root: str = DEFAULT_ATLAS_ROOT,
+        rate_limit: Optional[float] = None,
     ) -> None:
         self.dustkid_root = dustkid_root
         self.atlas_root = atlas_root
         self.dataset = dataset
-        self.sess = requests.Session()
+        self.http = HttpClient(rate_limit=rate_limit)
+        self.journal = DatasetJournal(os.path.join(dataset, "journal.jsonl"))
         self.solvers: SolverMapping = {}
         self.levels: LevelMetaMapping = {}
         self.level_ranks: Dict[str, float] = {}
         self.player_ranks: Dict[int, float] = {}
         self.rank_gen_time = 0
+        self.community_levels: Dict[str, Any] = {}
+        self.community_leaves: Set[str] = set()
+        self.community_subtrees: Dict[str, Set[str]] = {
+            level: set() for level in COMMUNITY_SUBTREES
+        }
+        self.banned_levels: Set[str] = set()
+        self._level_index: Optional[LevelIndex] = None
+
+        # Levels whose solvers were fetched during this session, and the
+        # levels and players whose solves changed as a result.
+        self.fetched_levels: Set[str] = set()
+        self.changed_levels: Set[str] = set()
+        self.changed_players: Set[int] = set()
 
     def download_solvers(self, level_id: str) -> Tuple[Optional[int], List[int]]:
         """Downloads the list of solver user IDs for the level. Returns
@@ -75,8 +348,7 @@ class DatasetManager:
                 urllib.parse.urlencode(query_parameters),
             )
             LOGGER.debug("Querying %s", url)
-            resp = self.sess.get(url)
-            resp.raise_for_status()
+            resp = self.http.get(url)
 
             scores_map = resp.json()["scores"]
 
@@ -119,9 +391,7 @@ class DatasetManager:
                 urllib.parse.urlencode(query_parameters),
             )
             LOGGER.debug("Querying %s", url)
-            resp = self.sess.get(url)
-
-            resp.raise_for_status()
+            resp = self.http.get(url)
             resp_data = resp.json()
             level_map = resp_data["levels"]
             for level_id, level_data in level_map.items():
@@ -133,22 +403,36 @@ class DatasetManager:
 
         return result
 
-    def load_community_levels(self, force_update: bool = False) -> None:
-        """Find all levels accessible from the community nexus"""
+    def load_community_levels(
+        self, force_update: bool = False, *, workers: int = 1
+    ) -> None:
+        """Find all levels accessible from the community nexus.
+
+        The nexus graph is crawled breadth-first, downloading and parsing each
+        frontier using up to `workers` concurrent threads. The community tree
+        is then assembled depth-first from the crawled nodes.
+
+        The tree is also flattened once here into self.community_leaves, the
+        set of all levels in the tree, and self.community_subtrees, the set
+        of levels below each nexus in COMMUNITY_SUBTREES.
+        """
         community_levels_path = os.path.join(self.dataset, "community.json")
         if not force_update:
             try:
                 with open(community_levels_path, "r") as flevs:
-                    self.community_levels = json.load(flevs)
+                    self._set_community_levels(json.load(flevs))
                 LOGGER.info("Read community.json dataset")
                 return
             except FileNotFoundError:
                 LOGGER.info("No existing community.json, computing")
 
-        try:
-            os.mkdir(os.path.join(self.dataset, "community_levels"))
-        except FileExistsError:
-            pass
+        # Community nexuses link to Atlas levels as well, so both level
+        # folders must exist before crawling.
+        for subdir in ("community_levels", "levels"):
+            try:
+                os.mkdir(os.path.join(self.dataset, subdir))
+            except FileExistsError:
+                pass
 
         visited = {
             "random",
@@ -165,6 +449,38 @@ class DatasetManager:
             "Single Player Nexus",
             "randomizer_nexus",
         }
+        community_roots = ("customnexus", "Multiplayer Nexus")
+
+        # Crawl every reachable level once, a frontier at a time.
+        nodes: Dict[str, Optional[_CommunityNode]] = {}
+        frontier = [
+            level
+            for level in dict.fromkeys(community_roots + LEVELS_CMP)
+            if level not in self.levels
+        ]
+        seen = visited | set(frontier)
+        self.http.resize_pool(workers)
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=max(1, workers)
+        ) as executor:
+            while frontier:
+                LOGGER.info("Crawling %d community levels", len(frontier))
+                next_frontier = []
+                for level, node in zip(
+                    frontier,
+                    executor.map(
+                        lambda level: self._crawl_community_level(level, force_update),
+                        frontier,
+                    ),
+                ):
+                    nodes[level] = node
+                    if node is None:
+                        continue
+                    for sub_level in node.sub_levels:
+                        if sub_level not in seen and sub_level not in self.levels:
+                            seen.add(sub_level)
+                            next_frontier.append(sub_level)
+                frontier = next_frontier
 
         def dfs(level: str, visited: Set[str]):
             if level in self.levels:
@@ -172,53 +488,19 @@ class DatasetManager:
                 # levels, we don't need to open them.
                 return {}
 
-            atlas_match = re.match(r".*-(\d+)", level)
-            atlas_id = 0
-            if atlas_match:
-                atlas_id = int(atlas_match.group(1))
-                path = self.download_atlas_level(atlas_id)
-            else:
-                path = self.download_community_level(level, force_update=force_update)
-            if not path:
+            node = nodes[level]
+            if node is None:
                 return None
-
-            with DFReader(open(path, "rb")) as reader:
-                level_data, region_offsets = reader.read_level_ex()
-                if level_data.level_type in (LevelType.NORMAL, LevelType.DUSTMOD):
-                    self.levels[level] = {
-                        "name": level_data.name.decode(),
-                        "author": "",
-                        "atlas_id": atlas_id,
-                        "level_type": int(level_data.level_type),
-                        "was_daily": False,
-                    }
-                    return {}
-                if level_data.level_type != LevelType.NEXUS:
-                    return None
-
-                for _ in region_offsets[:-1]:
-                    reader.read_region(level_data)
+            if node.leveldata is not None:
+                self.levels[level] = dict(node.leveldata)
+                self._journal_update(level, data=self.levels[level])
+                return {}
 
             LOGGER.info("Searching community level %s", level)
             visited.add(level)
 
-            sub_levels = []
-            for _, _, entity in level_data.entities.values():
-                if not isinstance(entity, LevelDoor):
-                    continue
-                sub_levels.append(entity.file_name.decode())
-
-            for _, _, entity in level_data.entities.values():
-                if not isinstance(entity, CustomScoreBook):
-                    continue
-
-                _, _, stringlist_entity = level_data.entities[entity.level_list]
-                for ind, tome_level in enumerate(stringlist_entity.data):
-                    if ind > 1:
-                        sub_levels.append(tome_level.decode())
-
             result = {}
-            for sub_level in sub_levels:
+            for sub_level in node.sub_levels:
                 if sub_level in visited:
                     continue
                 sub_result = dfs(sub_level, visited)
@@ -229,9 +511,9 @@ class DatasetManager:
 
             return result if result else None
 
-        self.community_levels = {
-            level: dfs(level, visited) for level in ("customnexus", "Multiplayer Nexus")
-        }
+        self._set_community_levels(
+            {level: dfs(level, visited) for level in community_roots}
+        )
         with open_and_swap(community_levels_path, "w") as flevs:
             json.dump(self.community_levels, flevs)
         LOGGER.info("Wrote community.json dataset")
@@ -240,9 +522,68 @@ class DatasetManager:
         for level in LEVELS_CMP:
             dfs(level, visited)
 
-        with open_and_swap(os.path.join(self.dataset, "levels.json"), "w") as flevels:
-            json.dump(self.levels, flevels)
-        LOGGER.info("Wrote levels.json dataset")
+        self._compact()
+
+    def _set_community_levels(self, community_levels: Dict[str, Any]) -> None:
+        """Replace the community tree and its flattened level sets."""
+        self.community_levels = community_levels
+        self.community_leaves, self.community_subtrees = flatten_community_tree(
+            community_levels, COMMUNITY_SUBTREES
+        )
+        self._level_index = None
+
+    def _crawl_community_level(
+        self, level: str, force_update: bool
+    ) -> Optional["_CommunityNode"]:
+        """Download and parse a single level reachable from the community
+        nexus. Returns None if the level is missing or is neither a normal
+        level nor a nexus.
+        """
+        atlas_match = re.match(r".*-(\d+)", level)
+        atlas_id = 0
+        if atlas_match:
+            atlas_id = int(atlas_match.group(1))
+            path = self.download_atlas_level(atlas_id)
+        else:
+            path = self.download_community_level(level, force_update=force_update)
+        if not path:
+            return None
+
+        with DFReader(open(path, "rb")) as reader:
+            level_data, region_offsets = reader.read_level_ex()
+            if level_data.level_type in (LevelType.NORMAL, LevelType.DUSTMOD):
+                return _CommunityNode(
+                    leveldata={
+                        "name": level_data.name.decode(),
+                        "author": "",
+                        "atlas_id": atlas_id,
+                        "level_type": int(level_data.level_type),
+                        "was_daily": False,
+                    },
+                    sub_levels=[],
+                )
+            if level_data.level_type != LevelType.NEXUS:
+                return None
+
+            for _ in region_offsets[:-1]:
+                reader.read_region(level_data)
+
+        sub_levels = []
+        for _, _, entity in level_data.entities.values():
+            if not isinstance(entity, LevelDoor):
+                continue
+            sub_levels.append(entity.file_name.decode())
+
+        for _, _, entity in level_data.entities.values():
+            if not isinstance(entity, CustomScoreBook):
+                continue
+
+            _, _, stringlist_entity = level_data.entities[entity.level_list]
+            for ind, tome_level in enumerate(stringlist_entity.data):
+                if ind > 1:
+                    sub_levels.append(tome_level.decode())
+
+        return _CommunityNode(leveldata=None, sub_levels=sub_levels)
 
     def load_levels(self, force_update: bool = False) -> None:
         """Load level metadata into self.levels. By default this will just
@@ -252,6 +593,7 @@ class DatasetManager:
         If `force_update` is set then it will always download new level metadata
         from the dustkid API.
         """
+        self._level_index = None
         levels_path = os.path.join(self.dataset, "levels.json")
         try:
             with open(levels_path, "r") as flevels:
@@ -261,14 +603,24 @@ class DatasetManager:
             self.levels = {}
             LOGGER.info("No existing levels.json")
 
+        for record in self.journal.replay():
+            if "data" in record:
+                self.levels.setdefault(record["level"], {}).update(record["data"])
+
         if force_update or not self.levels:
             new_levels = self.download_levels(
                 level_types=[LevelType.NORMAL, LevelType.DUSTMOD]
             )
 
-            # Merge downloaded data into existing level metadata
+            # Merge downloaded data into existing level metadata. The listing
+            # hash lets load_solvers notice levels whose listing changed since
+            # their solvers were last fetched.
             for level, new_leveldata in new_levels.items():
-                self.levels.setdefault(level, {}).update(new_leveldata)
+                leveldata = self.levels.setdefault(level, {})
+                leveldata.update(new_leveldata)
+                leveldata["listing_hash"] = zlib.crc32(
+                    json.dumps(new_leveldata, sort_keys=True).encode()
+                )
 
             # Filter out any removed (now hidden) levels.
             self.levels = {
@@ -277,24 +629,63 @@ class DatasetManager:
                 if level in new_levels
             }
 
-            with open_and_swap(levels_path, "w") as flevels:
-                json.dump(self.levels, flevels)
-            LOGGER.info("Wrote levels.json dataset")
+            self._compact()
 
-    def download_level_files(self) -> None:
+    def download_level_files(self, *, workers: int = 1) -> None:
         """Download the level binaries for each file in the levels metadata.
-        Only downloads level files that are missing.
+        Only downloads level files that are missing. Up to `workers` levels
+        are downloaded concurrently over a shared connection pool.
         """
         try:
             os.mkdir(os.path.join(self.dataset, "levels"))
         except FileExistsError:
             pass
 
-        for levelinfo in self.levels.values():
-            atlas_id = levelinfo["atlas_id"]
-            if not atlas_id:
-                continue
-            self.download_atlas_level(atlas_id)
+        atlas_ids = [
+            levelinfo["atlas_id"]
+            for levelinfo in self.levels.values()
+            if levelinfo["atlas_id"]
+            and not os.path.exists(
+                os.path.join(self.dataset, "levels", str(levelinfo["atlas_id"]))
+            )
+        ]
+        if not atlas_ids:
+            return
+
+        self.http.resize_pool(workers)
+        start_time = time.monotonic()
+        last_report = start_time
+        downloaded_bytes = 0
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=max(1, workers)
+        ) as executor:
+            futures = [
+                executor.submit(self.download_atlas_level, atlas_id)
+                for atlas_id in atlas_ids
+            ]
+            try:
+                for count, future in enumerate(
+                    concurrent.futures.as_completed(futures), 1
+                ):
+                    downloaded_bytes += os.path.getsize(future.result())
+
+                    now = time.monotonic()
+                    if (
+                        count == len(futures)
+                        or now - last_report > PROGRESS_REPORT_INTERVAL
+                    ):
+                        elapsed = max(now - start_time, 1e-9)
+                        LOGGER.info(
+                            "Downloaded %d/%d levels (%.1f levels/s, %.1f KiB/s)",
+                            count,
+                            len(futures),
+                            count / elapsed,
+                            downloaded_bytes / elapsed / 1024,
+                        )
+                        last_report = now
+            finally:
+                for future in futures:
+                    future.cancel()
 
     def download_atlas_level(self, atlas_id: int) -> str:
         """Download a singular level from Atlas by its ID."""
@@ -307,19 +698,9 @@ class DatasetManager:
 
         # Atlas sometimes generates 400s despite nothing being wrong with
         # the request. We try to ignore those and just retry where possible.
-        MAX_ATTEMPTS = 3
-        for attempt in range(MAX_ATTEMPTS):
-            resp = self.sess.get(url, stream=True)
-            try:
-                resp.raise_for_status()
-            except requests.exceptions.HTTPError:
-                if attempt + 1 == MAX_ATTEMPTS:
-                    raise
-                LOGGER.warning("request failed, pausing and then retrying")
-                self.sess = requests.Session()
-                time.sleep(1)
-            else:
-                break
+        resp = self.http.get(
+            url, stream=True, retry_statuses=HTTP_RETRY_STATUSES | {400}
+        )
 
         with open_and_swap(level_path, "wb") as fout:
             for chunk in resp.iter_content(1024):
@@ -342,21 +723,15 @@ class DatasetManager:
 
         # Atlas sometimes generates 400s despite nothing being wrong with
         # the request. We try to ignore those and just retry where possible.
-        MAX_ATTEMPTS = 3
-        for attempt in range(MAX_ATTEMPTS):
-            resp = self.sess.get(url, stream=True)
-            try:
-                if resp.status_code == 404:
-                    return ""
-                resp.raise_for_status()
-            except requests.exceptions.HTTPError:
-                if attempt + 1 == MAX_ATTEMPTS:
-                    raise
-                LOGGER.warning("request failed, pausing and then retrying")
-                self.sess = requests.Session()
-                time.sleep(1)
-            else:
-                break
+        resp = self.http.get(
+            url,
+            stream=True,
+            retry_statuses=HTTP_RETRY_STATUSES | {400},
+            accept_statuses={404},
+        )
+        if resp.status_code == 404:
+            resp.close()
+            return ""
 
         with open_and_swap(level_path, "wb") as fout:
             for chunk in resp.iter_content(1024):
@@ -364,7 +739,9 @@ class DatasetManager:
 
         return level_path
 
-    def extend_level_metadata(self, force_update: bool = False) -> None:
+    def extend_level_metadata(
+        self, force_update: bool = False, *, processes: int = 1
+    ) -> None:
         """Add additional metadata from the level files to the self.levels
         mapping. This will by default only update levels that have no existing
         extended metadata. This will ignore any levels where the level has not
@@ -372,85 +749,150 @@ class DatasetManager:
 
         If `force_update` is set then extended metadata will be updated for all
         levels regardless of if it already exists.
+
+        Level files are parsed across `processes` worker processes, or inline
+        if `processes` is 1, and the results merged into self.levels as they
+        complete.
         """
         EXTENDED_KEYS = ("tiles", "entities", "virtual")
 
-        updated_level_info = False
-        try:
-            for level, levelinfo in self.levels.items():
-                atlas_id = levelinfo["atlas_id"]
-                if not atlas_id:
-                    continue
-                if not force_update and all(key in levelinfo for key in EXTENDED_KEYS):
-                    continue
-
-                level_path = os.path.join(self.dataset, "levels", str(atlas_id))
-                if not os.path.exists(level_path):
-                    LOGGER.warning("could not find level file for %s", level)
-                    continue
-
-                LOGGER.info("Extract level metadata for %s", level)
-                tile_sets: Dict[TileSpriteSet, int] = collections.Counter()
-                entities: Dict[TileSpriteSet, int] = collections.Counter()
-                with DFReader(open(level_path, "rb")) as reader:
-                    level_data, region_offsets = reader.read_level_ex()
-                    levelinfo["virtual"] = level_data.virtual_character
-                    levelinfo["name"] = level_data.name.decode("utf-8")
+        self._level_index = None
+        level_paths = {}
+        for level, levelinfo in self.levels.items():
+            atlas_id = levelinfo["atlas_id"]
+            if not atlas_id:
+                continue
+            if not force_update and all(key in levelinfo for key in EXTENDED_KEYS):
+                continue
 
-                    for _ in region_offsets[:-1]:
-                        level_data = Level()
-                        reader.read_region(level_data)
+            level_path = os.path.join(self.dataset, "levels", str(atlas_id))
+            if not os.path.exists(level_path):
+                LOGGER.warning("could not find level file for %s", level)
+                continue
+            level_paths[level] = level_path
 
-                        for (layer, _, _), tile in level_data.tiles.items():
-                            if layer != 19:
-                                continue
-                            tile_sets[tile.sprite_set] += 1
+        if not level_paths:
+            return
 
-                        for _, _, entity in level_data.entities.values():
-                            entities[entity.etype] += 1
+        # Only start worker processes when there is parallelism to gain.
+        executor = None
+        results: Iterable[Tuple[str, dict]] = (
+            (level, _extract_level_metadata(level_path))
+            for level, level_path in level_paths.items()
+        )
+        if processes > 1 and len(level_paths) > 1:
+            executor = concurrent.futures.ProcessPoolExecutor(max_workers=processes)
+            futures = {
+                executor.submit(_extract_level_metadata, level_path): level
+                for level, level_path in level_paths.items()
+            }
+            results = (
+                (futures[future], future.result())
+                for future in concurrent.futures.as_completed(futures)
+            )
 
-                levelinfo["tiles"] = dict(tile_sets)
-                levelinfo["entities"] = dict(entities)
+        updated_level_info = False
+        try:
+            for level, level_metadata in results:
+                LOGGER.info("Extracted level metadata for %s", level)
+                self.levels[level].update(level_metadata)
+                self._journal_update(level, data=level_metadata)
                 updated_level_info = True
         finally:
+            if executor is not None:
+                executor.shutdown(wait=False, cancel_futures=True)
             if updated_level_info:
-                with open_and_swap(
-                    os.path.join(self.dataset, "levels.json"), "w"
-                ) as flevels:
-                    json.dump(self.levels, flevels)
+                self._compact()
 
-    def load_solvers(self, force_update: bool = False) -> None:
+    def load_solvers(
+        self,
+        force_update: bool = False,
+        *,
+        workers: int = 1,
+        refresh_ttl: Optional[float] = None,
+    ) -> None:
         """Load solvers information into self.solvers. Normally this will
         load cached data from disk and load any additional missing levels
         from the dustkid API.
 
         If `force_update` is set then all levels will be reloaded from the
         dustkid API.
+
+        If `refresh_ttl` is set then levels are also reloaded if their solver
+        watermark is older than `refresh_ttl` seconds or if their dustkid
+        listing has changed since their solvers were last fetched. Listing
+        changes are only seen if the listing was refreshed with
+        load_levels(force_update=True).
+
+        Leaderboards are downloaded using up to `workers` concurrent requests.
+        Progress is checkpointed to disk periodically so that an interrupted
+        update keeps the solvers downloaded so far.
         """
-        solvers = {}
+        self._level_index = None
+        stored_solvers: SolverMapping = {}
         if not force_update:
-            try:
-                with open(os.path.join(self.dataset, "solvers.json"), "r") as fsolvers:
-                    solvers = json.load(fsolvers)
-                LOGGER.info("Read solvers.json dataset")
-            except FileNotFoundError:
-                LOGGER.info("No solvers.json found, initialized empty dataset")
-
+            stored_solvers = self._read_solvers()
+
+        now = time.time()
+        pending = [
+            level_id
+            for level_id, level_data in self.levels.items()
+            if level_data["atlas_id"]
+            and (
+                force_update
+                or level_id not in stored_solvers
+                or (
+                    refresh_ttl is not None
+                    and _solvers_stale(level_id, level_data, refresh_ttl, now)
+                )
+            )
+        ]
+        LOGGER.info("Fetching solvers for %d levels", len(pending))
+        if not pending and all(level in self.levels for level in stored_solvers):
+            self.solvers = stored_solvers
+            return
+
+        # Materialize the stored solvers so that they can be updated.
+        solvers = {
+            level: list(level_solvers)
+            for level, level_solvers in stored_solvers.items()
+        }
         updated_solvers = False
+        self.http.resize_pool(workers)
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=max(1, workers))
         try:
-            for level_id, level_data in self.levels.items():
-                if not level_data["atlas_id"]:
-                    continue
-                if not force_update and level_id in solvers:
-                    continue
-
-                LOGGER.info("Calculating solvers for %s", level_id)
-                level_data["fastest_time"], solvers[level_id] = self.download_solvers(
-                    level_id
+            futures = {}
+            for level_id in pending:
+                futures[executor.submit(self.download_solvers, level_id)] = level_id
+
+            for future in concurrent.futures.as_completed(futures):
+                level_id = futures[future]
+                fastest_time, level_solvers = future.result()
+                LOGGER.info("Calculated solvers for %s", level_id)
+                level_update = {
+                    "fastest_time": fastest_time,
+                    # dustkid has no per-leaderboard change feed, so the
+                    # listing hash is the only change signal for a level.
+                    "solvers_watermark": {
+                        "fetched": time.time(),
+                        "listing_hash": self.levels[level_id].get("listing_hash"),
+                    },
+                }
+                self.levels[level_id].update(level_update)
+                self._track_solver_change(
+                    level_id, solvers.get(level_id, ()), level_solvers
                 )
+                solvers[level_id] = level_solvers
+                self._journal_update(level_id, data=level_update, solvers=level_solvers)
                 updated_solvers = True
 
+                if self.journal.appended >= JOURNAL_COMPACT_RECORDS:
+                    self._compact(solvers)
+
             orig_len = len(solvers)
+            for level, level_solvers in solvers.items():
+                if level not in self.levels:
+                    self._track_solver_change(level, level_solvers, ())
             solvers = {
                 level: solvers
                 for level, solvers in solvers.items()
@@ -458,19 +900,103 @@ class DatasetManager:
             }
             updated_solvers = updated_solvers or len(solvers) != orig_len
         finally:
+            executor.shutdown(wait=False, cancel_futures=True)
             if updated_solvers:
-                with open_and_swap(
-                    os.path.join(self.dataset, "levels.json"), "w"
-                ) as flevels:
-                    json.dump(self.levels, flevels)
-                with open_and_swap(
-                    os.path.join(self.dataset, "solvers.json"), "w"
-                ) as fsolvers:
-                    json.dump(solvers, fsolvers)
-                LOGGER.info("Updated solvers.json")
+                self._compact(solvers)
 
         self.solvers = solvers
 
+    def _track_solver_change(
+        self, level: str, old_solvers: Sequence[int], new_solvers: Sequence[int]
+    ) -> None:
+        """Record a solver list update for incremental rank updates."""
+        self.fetched_levels.add(level)
+        changed_players = set(old_solvers).symmetric_difference(new_solvers)
+        if changed_players or len(old_solvers) != len(new_solvers):
+            self.changed_levels.add(level)
+            self.changed_players.update(changed_players)
+
+    def _read_solvers(self) -> SolverMapping:
+        """Read the solver store from disk and replay any journaled solver
+        updates on top of it.
+        """
+        solvers = self._read_solver_store()
+
+        records = [record for record in self.journal.replay() if "solvers" in record]
+        if not records:
+            return solvers
+
+        LOGGER.info("Replaying %d journaled solver updates", len(records))
+        updated_solvers = {
+            level: list(level_solvers) for level, level_solvers in solvers.items()
+        }
+        for record in records:
+            updated_solvers[record["level"]] = record["solvers"]
+        return updated_solvers
+
+    def _read_solver_store(self) -> SolverMapping:
+        """Read the solver store from disk, converting a solvers.json from an
+        older dataset into the compact solvers.bin format if needed.
+        """
+        store_path = os.path.join(self.dataset, "solvers.bin")
+        try:
+            solvers = SolverStore(store_path)
+            LOGGER.info("Read solvers.bin dataset")
+            return solvers
+        except FileNotFoundError:
+            pass
+
+        try:
+            with open(os.path.join(self.dataset, "solvers.json"), "r") as fsolvers:
+                legacy_solvers = json.load(fsolvers)
+            LOGGER.info("Read solvers.json dataset")
+        except FileNotFoundError:
+            LOGGER.info("No solvers.bin found, initialized empty dataset")
+            return {}
+
+        try:
+            write_solver_store(store_path, legacy_solvers)
+        except OSError:
+            LOGGER.warning("Could not convert solvers.json to solvers.bin")
+            return legacy_solvers
+        LOGGER.info("Converted solvers.json to solvers.bin")
+        return SolverStore(store_path)
+
+    def _journal_update(
+        self,
+        level: str,
+        *,
+        data: Optional[dict] = None,
+        solvers: Optional[Sequence[int]] = None,
+    ) -> None:
+        """Append an update for a single level to the dataset journal."""
+        record: Dict[str, object] = {"level": level}
+        if data is not None:
+            record["data"] = data
+        if solvers is not None:
+            record["solvers"] = solvers
+        self.journal.append(record)
+
+    def _compact(self, solvers: Optional[SolverMapping] = None) -> None:
+        """Write levels.json, and solvers.bin if `solvers` is given, then drop
+        the journal records those files now contain.
+        """
+        with open_and_swap(os.path.join(self.dataset, "levels.json"), "w") as flevels:
+            json.dump(self.levels, flevels)
+        LOGGER.info("Wrote levels.json dataset")
+
+        if solvers is None:
+            self.journal.rewrite(
+                {"level": record["level"], "solvers": record["solvers"]}
+                for record in self.journal.replay()
+                if "solvers" in record
+            )
+            return
+
+        write_solver_store(os.path.join(self.dataset, "solvers.bin"), solvers)
+        LOGGER.info("Wrote solvers.bin dataset")
+        self.journal.rewrite(())
+
     def load_banned_levels(self) -> None:
         """Load list of banned levels into self.banned_levels as a set."""
         try:
@@ -479,12 +1005,30 @@ class DatasetManager:
         except FileNotFoundError:
             self.banned_levels = set()
             LOGGER.info("Found no banned_levels.json file")
+        self._level_index = None
+
+    def level_index(self) -> LevelIndex:
+        """Return the LevelIndex of the loaded levels, solvers, community
+        levels, banned levels and level ranks used to filter levels. It is
+        built on first use and rebuilt after any of those are reloaded.
+        """
+        if self._level_index is None:
+            self._level_index = LevelIndex(
+                self.levels,
+                self.solvers,
+                self.community_leaves,
+                self.community_subtrees,
+                self.banned_levels,
+                self.level_ranks,
+            )
+        return self._level_index
 
     def load_ranks(self) -> None:
         """Load player/level rank data from disk into self.level_ranks and
         self.player_ranks. If you want to recalculate ranks instead
         call compute_ranks.
         """
+        self._level_index = None
         try:
             with open(os.path.join(self.dataset, "ranks.json"), "r") as franks:
                 ranks = json.load(franks)
@@ -496,12 +1040,81 @@ class DatasetManager:
             self.player_ranks = {}
             self.rank_gen_time = 0
 
-    def compute_player_ranks(self) -> None:
+    def compute_player_ranks(
+        self,
+        *,
+        engine: str = "numpy",
+        warm_start: bool = False,
+        tolerance: float = DEFAULT_TOLERANCE,
+        max_iterations: Optional[int] = None,
+        acceleration: str = "none",
+        incremental: bool = False,
+        regression: str = "linear",
+        truncation_error: Optional[float] = None,
+        processes: int = 1,
+    ) -> None:
         """Compute and save rank data and store results in self.level_ranks
-        and self.player_ranks.
+        and self.player_ranks. The remaining options are passed through to
+        compute_ranks.
+
+        If `warm_start` is set the iteration starts from the current ranks,
+        loading them from ranks.json if none are loaded yet. After a small
+        solver update this converges in far fewer iterations.
+
+        If `incremental` is set the current ranks are instead updated with
+        update_ranks, propagating only the solver changes made since they
+        were generated. `tolerance` and `max_iterations` then apply to its
+        full recompute fallback, and only the numpy engine is supported.
+
+        A RankReport of the run is saved alongside as rank_report.json.
         """
-        self.level_ranks, self.player_ranks = compute_ranks(self.levels, self.solvers)
+        if incremental and engine != "numpy":
+            raise ValueError("incremental rank updates require the numpy engine")
+
+        report = RankReport()
+        initial = None
+        if warm_start or incremental:
+            if not self.level_ranks:
+                self.load_ranks()
+            if self.level_ranks:
+                initial = (self.level_ranks, self.player_ranks)
+
+        if incremental and initial is not None:
+            changed_levels, changed_players = self._solver_changes_since_ranks()
+            report.settings.update(
+                changed_levels=len(changed_levels),
+                changed_players=len(changed_players),
+            )
+            self.level_ranks, self.player_ranks = update_ranks(
+                self.levels,
+                self.solvers,
+                initial,
+                changed_levels,
+                changed_players,
+                fallback_tolerance=tolerance,
+                max_iterations=max_iterations,
+                acceleration=acceleration,
+                regression=regression,
+                truncation_error=truncation_error,
+                processes=processes,
+                report=report,
+            )
+        else:
+            self.level_ranks, self.player_ranks = compute_ranks(
+                self.levels,
+                self.solvers,
+                engine=engine,
+                initial=initial,
+                tolerance=tolerance,
+                max_iterations=max_iterations,
+                acceleration=acceleration,
+                regression=regression,
+                truncation_error=truncation_error,
+                processes=processes,
+                report=report,
+            )
         self.rank_gen_time = time.time_ns()
+        self._level_index = None
         with open_and_swap(os.path.join(self.dataset, "ranks.json"), "w") as franks:
             json.dump(
                 {
@@ -511,10 +1124,311 @@ class DatasetManager:
                 },
                 franks,
             )
+        with open_and_swap(
+            os.path.join(self.dataset, "rank_report.json"), "w"
+        ) as freport:
+            json.dump(
+                {"gen_time": self.rank_gen_time, **report.to_dict()},
+                freport,
+                indent=2,
+            )
+        LOGGER.info(
+            "Computed ranks in %d iterations and %.2fs",
+            len(report.iterations),
+            report.wall_time,
+        )
+
+    def _solver_changes_since_ranks(self) -> Tuple[Set[str], Set[int]]:
+        """Return the levels and players whose solves changed since the
+        current ranks were generated. This includes the changes tracked
+        during this session and, for levels fetched by an earlier session
+        after the ranks were generated, all of their solvers.
+        """
+        changed_levels = set(self.changed_levels)
+        changed_players = set(self.changed_players)
+        rank_time = self.rank_gen_time / 1e9
+        for level, leveldata in self.levels.items():
+            watermark = leveldata.get("solvers_watermark")
+            if (
+                watermark is not None
+                and watermark["fetched"] > rank_time
+                and level not in self.fetched_levels
+                and level in self.solvers
+            ):
+                changed_levels.add(level)
+                changed_players.update(self.solvers[level])
+        return changed_levels, changed_players
+
+
+def flatten_community_tree(
+    tree: Mapping[str, Any], subtree_roots: Sequence[str] = ()
+) -> Tuple[Set[str], Dict[str, Set[str]]]:
+    """Return the set of all leaf levels in the community `tree` along with a
+    mapping from each nexus in `subtree_roots` to the leaf levels below it.
+    """
+    subtrees: Dict[str, Set[str]] = {level: set() for level in subtree_roots}
+
+    def dfs(tree: Mapping[str, Any]) -> Set[str]:
+        result: Set[str] = set()
+        for level, subtree in tree.items():
+            if not subtree:
+                result.add(level)
+                continue
+
+            subres = dfs(subtree)
+            if level in subtrees:
+                subtrees[level] = set(subres)
+            if len(result) > len(subres):
+                result.update(subres)
+            else:
+                subres.update(result)
+                result = subres
+
+        return result
 
+    return dfs(tree), subtrees
 
-def main():
-    """Update dataset CLI interface"""
+
+class _BitScanner:
+    """
+    Minimal little-endian bit reader over an in-memory buffer used to skim
+    region data without materializing dustmaker objects.
+    """
+
+    __slots__ = ("data", "pos")
+
+    def __init__(self, data: bytes) -> None:
+        self.data = data
+        self.pos = 0
+
+    def read(self, bits: int) -> int:
+        """Read the next `bits` bits as an unsigned integer."""
+        pos = self.pos
+        val = int.from_bytes(self.data[pos >> 3 : (pos + bits + 7) >> 3], "little")
+        self.pos = pos + bits
+        return (val >> (pos & 7)) & ((1 << bits) - 1)
+
+    def read_signed(self, bits: int) -> int:
+        """Read the next `bits` bits as a two's complement integer."""
+        val = self.read(bits)
+        if val & (1 << (bits - 1)):
+            val -= 1 << bits
+        return val
+
+    def read_6bit_str(self) -> str:
+        """Read a '6-bit' string as used for entity type names."""
+        chrs = []
+        for _ in range(self.read(6)):
+            v = self.read(6)
+            if v < 10:
+                chrs.append(chr(ord("0") + v))
+            elif v < 36:
+                chrs.append(chr(ord("A") + v - 10))
+            elif v == 36:
+                chrs.append("_")
+            elif v < 63:
+                chrs.append(chr(ord("a") + v - 37))
+            else:
+                chrs.append("{")
+        return "".join(chrs)
+
+    def skip_6bit_str(self) -> None:
+        """Skip over a '6-bit' string."""
+        slen = self.read(6)
+        self.pos += 6 * slen
+
+    def skip_string(self) -> int:
+        """Skip over a string variable and return its length in bytes."""
+        slen = self.read(16)
+        self.pos += 8 * slen
+        return slen
+
+    def skip_variable(self, vtype: int) -> None:
+        """Skip over a variable of the given type without decoding it."""
+        if vtype == VariableType.BOOL:
+            self.pos += 1
+        elif vtype in (VariableType.UINT, VariableType.INT):
+            self.pos += 32
+        elif vtype == VariableType.FLOAT:
+            self.pos += 64
+        elif vtype == VariableType.VEC2:
+            self.pos += 128
+        elif vtype == VariableType.STRING:
+            self.skip_string()
+        elif vtype == VariableType.ARRAY:
+            atype = self.read(4)
+            for _ in range(self.read(16)):
+                self.skip_variable(atype)
+        elif vtype == VariableType.STRUCT:
+            while True:
+                vtype = self.read(4)
+                if vtype == VariableType.NULL:
+                    break
+                self.skip_6bit_str()
+                if vtype != VariableType.STRING:
+                    self.skip_variable(vtype)
+                    continue
+
+                # Long strings are split across several chunks of max length.
+                while self.skip_string() == 0xFFFF:
+                    self.pos += 4
+                    self.skip_6bit_str()
+        else:
+            raise ValueError("unknown variable type")
+
+
+# Bit sizes of fixed-size records within a level segment.
+_TILE_BITS = 5 + 5 + 5 + 3 + 12 * 8
+_TILE_SPRITE_SET_OFFSET = 5 + 5 + 5 + 3 + 10 * 8
+_DUST_BITS = 5 + 5 + 12 * 8
+_PROP_BITS = 8 + 8 + 64 + 16 + 1 + 1 + 8 + 12 + 12 + 8
+_ENTITY_FIXED_BITS = 40 + 40 + 16 + 8 + 1 + 1 + 1
+
+
+def _scan_segment(
+    scanner: _BitScanner,
+    tile_sets: Dict[int, int],
+    region_entities: Dict[int, str],
+) -> None:
+    """Scan a single segment, counting layer 19 tile sprite sets into
+    `tile_sets` and recording the entity type of each entity ID in
+    `region_entities`. Mirrors dustmaker's DFReader.read_segment.
+    """
+    start_index = scanner.pos
+    segment_size = scanner.read(32)
+    version = scanner.read(16)
+    scanner.pos += 24
+    if version > 4:
+        scanner.pos += 64
+    if version > 5:
+        scanner.pos += 32
+
+    flags = scanner.read(32)
+    if flags & 1:
+        for _ in range(scanner.read(8)):
+            layer = scanner.read(8)
+            tiles = scanner.read(10)
+            if layer != 19:
+                scanner.pos += tiles * _TILE_BITS
+                continue
+            for _ in range(tiles):
+                scanner.pos += _TILE_SPRITE_SET_OFFSET
+                tile_sets[scanner.read(4)] += 1
+                scanner.pos += _TILE_BITS - _TILE_SPRITE_SET_OFFSET - 4
+
+    if flags & 2:
+        dusts = scanner.read(10)
+        scanner.pos += dusts * _DUST_BITS
+
+    if flags & 8:
+        for _ in range(scanner.read(16)):
+            if scanner.read_signed(32) >= 0:
+                scanner.pos += _PROP_BITS
+
+    if flags & 4:
+        entities = []
+        has_extended_names = False
+        for _ in range(scanner.read(16)):
+            id_num = scanner.read_signed(32)
+            if id_num < 0:
+                continue
+
+            etype = scanner.read_6bit_str()
+            if etype == "entity" and version > 7:
+                has_extended_names = True
+            scanner.pos += _ENTITY_FIXED_BITS
+            scanner.skip_variable(VariableType.STRUCT)
+            entities.append((id_num, etype))
+
+        if has_extended_names:
+            scanner.pos = start_index + (segment_size - 4) * 8
+            extra_names_index = scanner.read(32)
+            scanner.pos -= extra_names_index + 32
+
+        for id_num, etype in entities:
+            if has_extended_names and etype == "entity":
+                etype = scanner.read_6bit_str()
+            region_entities[id_num] = etype
+
+    scanner.pos = start_index + segment_size * 8
+
+
+def scan_level_histograms(
+    reader: DFReader, region_offsets: List[int]
+) -> Tuple[Dict[TileSpriteSet, int], Dict[str, int]]:
+    """Scan the region data following a call to `reader.read_level_ex()` and
+    return histograms of layer 19 tile sprite sets and of entity types. This
+    produces the same counts as reading each region into a `Level` but never
+    constructs tile or entity objects.
+    """
+    tile_sets: Dict[int, int] = collections.Counter()
+    entities: Dict[str, int] = collections.Counter()
+    region_data = reader.read_bytes(region_offsets[-1])
+    for region_offset in region_offsets[:-1]:
+        region_len, _, _, _, _, segments, _ = struct.unpack_from(
+            "<IIhhHHB", region_data, region_offset
+        )
+        scanner = _BitScanner(
+            zlib.decompress(
+                region_data[region_offset + 17 : region_offset + region_len]
+            )
+        )
+
+        # Entity IDs are unique within a region; later segments replace any
+        # earlier entity with the same ID just like Level.add_entity would.
+        region_entities: Dict[int, str] = {}
+        for _ in range(segments):
+            scanner.pos = (scanner.pos + 7) & ~7
+            _scan_segment(scanner, tile_sets, region_entities)
+
+        for etype in region_entities.values():
+            entities[etype] += 1
+
+    return (
+        {TileSpriteSet(sprite_set): cnt for sprite_set, cnt in tile_sets.items()},
+        dict(entities),
+    )
+
+
+def _extract_level_metadata(level_path: str) -> dict:
+    """Parse a level file and return its extended metadata. This runs in
+    worker processes so only takes and returns picklable data.
+    """
+    with DFReader(open(level_path, "rb")) as reader:
+        level_data, region_offsets = reader.read_level_ex()
+        tile_sets, entities = scan_level_histograms(reader, region_offsets)
+
+    return {
+        "virtual": level_data.virtual_character,
+        "name": level_data.name.decode("utf-8"),
+        "tiles": tile_sets,
+        "entities": entities,
+    }
+
+
+def _solvers_stale(level_id: str, level_data: dict, ttl: float, now: float) -> bool:
+    """Returns True if the solvers for a level should be refreshed because
+    they were fetched more than `ttl` seconds ago (less a per-level jitter) or
+    because the level's listing changed since they were fetched.
+    """
+    watermark = level_data.get("solvers_watermark")
+    if watermark is None:
+        return True
+    if watermark["listing_hash"] != level_data.get("listing_hash"):
+        return True
+
+    jitter = (zlib.crc32(level_id.encode()) % 1024) / 1024 * SOLVERS_TTL_JITTER
+    return now - watermark["fetched"] > ttl * (1.0 - jitter)
+
+
+def main(
+    argv: Optional[Sequence[str]] = None,
+    *,
+    stage_hook: Optional[Callable[[str, float], None]] = None,
+) -> None:
+    """Update dataset CLI interface. `stage_hook`, if given, is called with
+    the name and wall time of each pipeline stage as it finishes.
+    """
     parser = argparse.ArgumentParser(description="update randomizer nexus dataset")
     parser.add_argument(
         "--dustkid",
@@ -566,13 +1480,121 @@ def main():
         required=False,
         help="Force update solver list for each level",
     )
+    parser.add_argument(
+        "--refresh-solvers-ttl",
+        default=None,
+        type=float,
+        required=False,
+        help="refresh solver lists fetched more than this many hours ago or "
+        "whose level listing changed; implies --update-levels so that listing "
+        "changes are seen",
+    )
+    parser.add_argument(
+        "--workers",
+        default=1,
+        type=int,
+        required=False,
+        help="number of concurrent requests to make to dustkid and Atlas",
+    )
+    parser.add_argument(
+        "--processes",
+        default=1,
+        type=int,
+        required=False,
+        help="number of processes to use when parsing level files",
+    )
+    parser.add_argument(
+        "--rate-limit",
+        default=None,
+        type=float,
+        required=False,
+        help="maximum requests per second to make to each host",
+    )
+    parser.add_argument(
+        "--rank-engine",
+        default="numpy",
+        choices=RANK_ENGINES,
+        required=False,
+        help="implementation used to compute player and level ranks",
+    )
+    parser.add_argument(
+        "--rank-warm-start",
+        action="store_const",
+        const=True,
+        default=False,
+        required=False,
+        help="start the rank iteration from the existing ranks.json",
+    )
+    parser.add_argument(
+        "--rank-regression",
+        default="linear",
+        choices=REGRESSION_MODELS,
+        required=False,
+        help="model used to predict the expected SS count of levels; huber "
+        "requires scikit-learn",
+    )
+    parser.add_argument(
+        "--rank-truncation-error",
+        nargs="?",
+        default=None,
+        const=DEFAULT_TRUNCATION_ERROR,
+        type=float,
+        required=False,
+        help="truncate each rank sum to the leading scores needed to keep its "
+        "error below this bound (default bound %(const)g)",
+    )
+    parser.add_argument(
+        "--rank-processes",
+        default=1,
+        type=int,
+        required=False,
+        help="number of processes to compute ranks with, numpy engine only",
+    )
+    parser.add_argument(
+        "--rank-incremental",
+        action="store_const",
+        const=True,
+        default=False,
+        required=False,
+        help="update the existing ranks.json with only the solver changes "
+        "made since it was generated",
+    )
+    parser.add_argument(
+        "--rank-acceleration",
+        default="none",
+        choices=RANK_ACCELERATIONS,
+        required=False,
+        help="rank convergence acceleration, only supported by the numpy engine",
+    )
+    parser.add_argument(
+        "--rank-tolerance",
+        default=DEFAULT_TOLERANCE,
+        type=float,
+        required=False,
+        help="stop iterating once the squared change in ranks is below this",
+    )
+    parser.add_argument(
+        "--rank-max-iterations",
+        default=None,
+        type=int,
+        required=False,
+        help="maximum number of rank iterations",
+    )
     parser.add_argument(
         "--verbose",
         "-v",
         action="count",
         default=0,
     )
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
+    if args.rank_engine == "python":
+        # Reject these before any of the slow download stages run.
+        if args.rank_acceleration != "none":
+            parser.error("--rank-acceleration requires --rank-engine numpy")
+        if args.rank_processes > 1:
+            parser.error("--rank-processes requires --rank-engine numpy")
+        if args.rank_incremental:
+            parser.error("--rank-incremental requires --rank-engine numpy")
 
     log_level = logging.WARN
     if args.verbose > 1:
@@ -585,14 +1607,65 @@ def main():
     )
 
     dataset = DatasetManager(
-        args.dataset, dustkid_root=args.dustkid, atlas_root=args.atlas
+        args.dataset,
+        dustkid_root=args.dustkid,
+        atlas_root=args.atlas,
+        rate_limit=args.rate_limit,
     )
-    dataset.load_levels(args.update_levels)
-    dataset.load_community_levels(args.update_community)
-    dataset.download_level_files()
-    dataset.extend_level_metadata(args.update_levels_full)
-    dataset.load_solvers(args.update_solvers)
-    dataset.compute_player_ranks()
+    stages: List[Tuple[str, Callable[[], None]]] = [
+        (
+            "levels",
+            lambda: dataset.load_levels(
+                args.update_levels or args.refresh_solvers_ttl is not None
+            ),
+        ),
+        (
+            "community",
+            lambda: dataset.load_community_levels(
+                args.update_community, workers=args.workers
+            ),
+        ),
+        ("level_files", lambda: dataset.download_level_files(workers=args.workers)),
+        (
+            "metadata",
+            lambda: dataset.extend_level_metadata(
+                args.update_levels_full, processes=args.processes
+            ),
+        ),
+        (
+            "solvers",
+            lambda: dataset.load_solvers(
+                args.update_solvers,
+                workers=args.workers,
+                refresh_ttl=(
+                    None
+                    if args.refresh_solvers_ttl is None
+                    else args.refresh_solvers_ttl * 3600
+                ),
+            ),
+        ),
+        (
+            "ranks",
+            lambda: dataset.compute_player_ranks(
+                engine=args.rank_engine,
+                warm_start=args.rank_warm_start,
+                tolerance=args.rank_tolerance,
+                max_iterations=args.rank_max_iterations,
+                acceleration=args.rank_acceleration,
+                incremental=args.rank_incremental,
+                regression=args.rank_regression,
+                truncation_error=args.rank_truncation_error,
+                processes=args.rank_processes,
+            ),
+        ),
+    ]
+    for stage, run_stage in stages:
+        start_time = time.monotonic()
+        run_stage()
+        elapsed = time.monotonic() - start_time
+        LOGGER.info("Finished %s stage in %.2fs", stage, elapsed)
+        if stage_hook is not None:
+            stage_hook(stage, elapsed)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,95 @@
+"""
+Append-only journal of per-level dataset updates.
+
+Rather than rewriting levels.json and solvers.bin after every update, the
+dataset updater appends one JSON record per updated level to the journal and
+only periodically compacts the journal into the canonical files. Records are
+replayed on top of the canonical files when a dataset is loaded.
+
+Each record is a JSON object on its own line with a "level" key and either or
+both of
+
+    "data"     level metadata keys to update in levels.json
+    "solvers"  the complete solver list for the level
+"""
+import json
+import logging
+import os
+from typing import IO, Iterable, List, Optional
+
+from .util import open_and_swap
+
+LOGGER = logging.getLogger(__name__)
+
+
+class DatasetJournal:
+    """
+    Append-only journal stored at `path`. The file is only created once the
+    first record is appended.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.fout: Optional[IO[str]] = None
+        self.appended = 0
+
+    def append(self, record: dict) -> None:
+        """Append a record and flush it to the OS so that it survives the
+        process being interrupted.
+        """
+        if self.fout is None:
+            self.fout = open(  # pylint: disable=consider-using-with
+                self.path, "a", encoding="utf-8"
+            )
+            if self.fout.tell() > 0 and not _ends_with_newline(self.path):
+                # Terminate a torn record left by an interrupted write.
+                self.fout.write("\n")
+        self.fout.write(json.dumps(record) + "\n")
+        self.fout.flush()
+        self.appended += 1
+
+    def replay(self) -> List[dict]:
+        """Return all complete records in the journal in the order they were
+        written. Torn records from interrupted writes are ignored.
+        """
+        records = []
+        try:
+            with open(self.path, "r", encoding="utf-8") as fin:
+                for line in fin:
+                    try:
+                        records.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        LOGGER.warning("Ignoring truncated journal record")
+        except FileNotFoundError:
+            pass
+        return records
+
+    def rewrite(self, records: Iterable[dict]) -> None:
+        """Atomically replace the journal contents with `records`. Used after
+        compaction to drop records that are now in the canonical files.
+        """
+        self.close()
+        records = list(records)
+        if not records:
+            try:
+                os.unlink(self.path)
+            except FileNotFoundError:
+                pass
+        else:
+            with open_and_swap(self.path, "w") as fout:
+                for record in records:
+                    fout.write(json.dumps(record) + "\n")
+        self.appended = 0
+
+    def close(self) -> None:
+        """Close the journal file if it is open."""
+        if self.fout is not None:
+            self.fout.close()
+            self.fout = None
+
+
+def _ends_with_newline(path: str) -> bool:
+    """Returns True if the file at `path` ends with a newline."""
+    with open(path, "rb") as fin:
+        fin.seek(-1, os.SEEK_END)
+        return fin.read(1) == b"\n"
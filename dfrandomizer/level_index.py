@@ -0,0 +1,324 @@
+"""
+Precomputed per-dataset index used to answer the randomizer's level filters.
+
+Levels are numbered densely in the order of the dataset's level mapping and
+each boolean level property is stored as a bitset over those numbers, packed
+eight levels to a byte. A y/n/blank property filter then reduces to a few
+bitwise operations over these bitsets and only the levels that survive every
+filter are turned back into level IDs.
+"""
+import bisect
+import itertools
+from typing import AbstractSet, Dict, Iterable, List, Mapping, Optional, Sequence
+
+import numpy as np
+
+from .level_sets import LEVELS_CMP
+
+# Community nexus subtrees whose levels are exposed as their own properties,
+# keyed by property name. DatasetManager tracks the levels below each of
+# these nexuses.
+COMMUNITY_SUBTREE_FILTERS = {
+    "cw": "Main Nexus CW",
+    "ccw": "Main Nexus CCW",
+    "clunky": "clunknexusdx",
+    "backwards": "Main Nexus Backwards",
+}
+
+# Boolean level properties that can be filtered with y/n/blank filters.
+LEVEL_PROPERTIES = (
+    "cmp",
+    "daily",
+    "community",
+    "apples",
+) + tuple(COMMUNITY_SUBTREE_FILTERS)
+
+Bitset = np.ndarray
+
+
+def _pack_flags(flags: List[bool]) -> Bitset:
+    """Pack one flag per indexed level into a bitset."""
+    return np.packbits(np.array(flags, dtype=bool))
+
+
+class RangeIndex:
+    """
+    Sorted index of an integer value per level, given as `values` in level
+    index order. Levels whose value is None are left out of the index and so
+    never match a range.
+    """
+
+    def __init__(self, values: Sequence[Optional[int]]) -> None:
+        known = np.array(
+            [ind for ind, value in enumerate(values) if value is not None],
+            dtype=np.int64,
+        )
+        known_values = np.array(
+            [value for value in values if value is not None], dtype=np.int64
+        )
+        order = np.argsort(known_values, kind="stable")
+        self.positions = known[order]
+        self.values = known_values[order]
+
+    def select(self, low: Optional[int], high: Optional[int]) -> np.ndarray:
+        """Return the positions of the levels whose value lies between `low`
+        and `high` inclusive. Either bound may be None for an open range.
+        """
+        start, end = 0, len(self.values)
+        if low is not None:
+            start = int(np.searchsorted(self.values, low, side="left"))
+        if high is not None:
+            end = int(np.searchsorted(self.values, high, side="right"))
+        return self.positions[start:end]
+
+
+class SolverIndex:
+    """
+    Inverted index from player ID to the positions of the levels they have
+    SS'd, built from `solvers` for the levels `level_ids` in index order.
+    Edges are stored grouped by player, with the levels of the i-th player in
+    `players` at level_positions[indptr[i]:indptr[i + 1]].
+    """
+
+    def __init__(
+        self, level_ids: Sequence[str], solvers: Mapping[str, Sequence[int]]
+    ) -> None:
+        level_solvers = [solvers.get(level, ()) for level in level_ids]
+        degrees = np.fromiter(
+            (len(players) for players in level_solvers),
+            dtype=np.int64,
+            count=len(level_solvers),
+        )
+        edge_players = np.fromiter(
+            itertools.chain.from_iterable(level_solvers),
+            dtype=np.int64,
+            count=int(degrees.sum()),
+        )
+        edge_levels = np.repeat(np.arange(len(level_ids), dtype=np.int64), degrees)
+
+        order = np.argsort(edge_players, kind="stable")
+        self.players, starts = np.unique(edge_players[order], return_index=True)
+        self.indptr = np.append(starts, len(order))
+        self.level_positions = edge_levels[order]
+
+    def solved(self, player: int) -> np.ndarray:
+        """Return the positions of the levels SS'd by `player`."""
+        ind = int(np.searchsorted(self.players, player))
+        if ind == len(self.players) or self.players[ind] != player:
+            return self.level_positions[:0]
+        return self.level_positions[self.indptr[ind] : self.indptr[ind + 1]]
+
+
+class AuthorIndex:
+    """
+    Index from lowercased author name to the positions of their levels,
+    built from `authors`, the author of each level in index order. Author
+    names are also kept sorted so that they can be looked up by prefix.
+    """
+
+    def __init__(self, authors: Sequence[str]) -> None:
+        grouped: Dict[str, List[int]] = {}
+        self.display_names: Dict[str, str] = {}
+        for ind, author in enumerate(authors):
+            key = author.lower()
+            grouped.setdefault(key, []).append(ind)
+            self.display_names.setdefault(key, author)
+        self.positions = {
+            key: np.array(positions, dtype=np.int64)
+            for key, positions in grouped.items()
+        }
+        self.names = sorted(self.positions)
+
+    def levels(self, authors: Iterable[str]) -> np.ndarray:
+        """Return the positions of the levels by any of the lowercased
+        `authors`.
+        """
+        positions = [self.positions[author] for author in authors if author in self]
+        if not positions:
+            return np.zeros(0, dtype=np.int64)
+        return np.concatenate(positions)
+
+    def complete(self, prefix: str, limit: int) -> List[str]:
+        """Return up to `limit` author names starting with `prefix`, ignoring
+        case, ordered by their number of levels and then by name.
+        """
+        prefix = prefix.lower()
+        start = bisect.bisect_left(self.names, prefix)
+        matches = []
+        for name in itertools.islice(self.names, start, None):
+            if not name.startswith(prefix):
+                break
+            if name:
+                matches.append(name)
+        matches.sort(key=lambda name: (-len(self.positions[name]), name))
+        return [self.display_names[name] for name in matches[:limit]]
+
+    def __contains__(self, author: object) -> bool:
+        return author in self.positions
+
+
+class LevelIndex:
+    """
+    Bitset index over `levels`, a mapping of level IDs to level metadata as
+    held by DatasetManager.levels. `community` and `community_subtrees` are
+    the flattened community levels of the dataset, as held by
+    DatasetManager.community_leaves and DatasetManager.community_subtrees,
+    and `banned_levels` its banned levels. `level_ranks` are the level ranks
+    of the dataset.
+
+    `bitsets` maps each name in LEVEL_PROPERTIES, as well as "banned",
+    "has_atlas_id" and "ranked", to the bitset of levels with that property. `ranges`
+    maps "ss_count", the number of solvers of each level in `solvers`, and
+    "fastest_time" to a RangeIndex of that value. `solver_index` is the
+    SolverIndex of `solvers` and `author_index` the AuthorIndex of the
+    level authors. `rank_order` holds the positions of the ranked levels
+    ordered by rank, ties ordered by position.
+    """
+
+    def __init__(
+        self,
+        levels: Mapping[str, dict],
+        solvers: Mapping[str, Sequence[int]],
+        community: AbstractSet[str],
+        community_subtrees: Mapping[str, AbstractSet[str]],
+        banned_levels: AbstractSet[str],
+        level_ranks: Mapping[str, float],
+    ) -> None:
+        self.level_ids: List[str] = list(levels)
+        self.positions = {level: ind for ind, level in enumerate(self.level_ids)}
+
+        leveldatas = list(levels.values())
+        self.bitsets: Dict[str, Bitset] = {
+            "cmp": self.bitset(LEVELS_CMP),
+            "daily": _pack_flags(
+                [bool(leveldata.get("was_daily")) for leveldata in leveldatas]
+            ),
+            "community": self.bitset(community),
+            "apples": _pack_flags(
+                [
+                    "hittable_apple" in leveldata.get("entities", ())
+                    for leveldata in leveldatas
+                ]
+            ),
+            "banned": self.bitset(banned_levels),
+            "has_atlas_id": _pack_flags(
+                [bool(leveldata.get("atlas_id")) for leveldata in leveldatas]
+            ),
+            "ranked": self.bitset(level_ranks),
+        }
+        for name, root in COMMUNITY_SUBTREE_FILTERS.items():
+            self.bitsets[name] = self.bitset(community_subtrees[root])
+
+        self.ranges: Dict[str, RangeIndex] = {
+            "ss_count": RangeIndex(
+                [len(solvers.get(level, ())) for level in self.level_ids]
+            ),
+            "fastest_time": RangeIndex(
+                [leveldata.get("fastest_time") for leveldata in leveldatas]
+            ),
+        }
+        self.solver_index = SolverIndex(self.level_ids, solvers)
+        self.author_index = AuthorIndex(
+            [leveldata.get("author", "") for leveldata in leveldatas]
+        )
+
+        ranked = np.array(
+            [ind for ind, level in enumerate(self.level_ids) if level in level_ranks],
+            dtype=np.int64,
+        )
+        ranks = np.array(
+            [level_ranks[self.level_ids[ind]] for ind in ranked.tolist()],
+            dtype=np.float64,
+        )
+        self.rank_order = ranked[np.argsort(ranks, kind="stable")]
+
+    def __len__(self) -> int:
+        return len(self.level_ids)
+
+    def empty(self) -> Bitset:
+        """Return a bitset with no levels set."""
+        return np.zeros((len(self.level_ids) + 7) // 8, dtype=np.uint8)
+
+    def full(self) -> Bitset:
+        """Return a bitset with every level set."""
+        return ~self.empty()
+
+    def bitset(self, levels: Iterable[str]) -> Bitset:
+        """Return the bitset of the indexed levels among `levels`."""
+        return self.position_bitset(
+            np.array(
+                [self.positions[level] for level in levels if level in self.positions],
+                dtype=np.int64,
+            )
+        )
+
+    def position_bitset(self, positions: np.ndarray) -> Bitset:
+        """Return the bitset of the levels at index `positions`."""
+        flags = np.zeros(len(self.level_ids), dtype=bool)
+        flags[positions] = True
+        return np.packbits(flags)
+
+    def range_bitset(
+        self, name: str, low: Optional[int], high: Optional[int]
+    ) -> Bitset:
+        """Return the bitset of levels whose value in the range index `name`
+        lies between `low` and `high` inclusive. Either bound may be None.
+        """
+        return self.position_bitset(self.ranges[name].select(low, high))
+
+    def solvers_bitset(
+        self, ss_users: Iterable[int], no_ss_users: Iterable[int]
+    ) -> Bitset:
+        """Return the bitset of levels SS'd by all of `ss_users` and by none
+        of `no_ss_users`.
+        """
+        result = self.full()
+        for player in ss_users:
+            result &= self.position_bitset(self.solver_index.solved(player))
+        for player in no_ss_users:
+            result &= ~self.position_bitset(self.solver_index.solved(player))
+        return result
+
+    def authors_bitset(
+        self, required_authors: AbstractSet[str], blocked_authors: AbstractSet[str]
+    ) -> Bitset:
+        """Return the bitset of levels by one of the lowercased
+        `required_authors`, if any are given, and by none of the lowercased
+        `blocked_authors`.
+        """
+        result = self.full()
+        if required_authors:
+            result &= self.position_bitset(self.author_index.levels(required_authors))
+        if blocked_authors:
+            result &= ~self.position_bitset(self.author_index.levels(blocked_authors))
+        return result
+
+    def filter_properties(self, filters: Mapping[str, str]) -> Bitset:
+        """Return the bitset of levels matching the y/n/blank `filters`, keyed
+        by name in LEVEL_PROPERTIES. Levels must have at least one of the
+        properties filtered with "y", if any, and none of the properties
+        filtered with "n".
+        """
+        result = self.full()
+        required = [name for name, value in filters.items() if value == "y"]
+        if required:
+            required_bits = self.empty()
+            for name in required:
+                required_bits |= self.bitsets[name]
+            result &= required_bits
+        for name, value in filters.items():
+            if value == "n":
+                result &= ~self.bitsets[name]
+        return result
+
+    def ranked_positions(self, bits: Bitset) -> np.ndarray:
+        """Return the positions of the ranked levels set in `bits` ordered by
+        rank, ties ordered by position.
+        """
+        flags = np.unpackbits(bits, count=len(self.level_ids)).view(bool)
+        return self.rank_order[flags[self.rank_order]]
+
+    def levels(self, bits: Bitset) -> List[str]:
+        """Return the IDs of the levels set in `bits` in index order."""
+        positions = np.flatnonzero(np.unpackbits(bits, count=len(self.level_ids)))
+        return [self.level_ids[ind] for ind in positions.tolist()]
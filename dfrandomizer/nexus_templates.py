@@ -87,6 +87,23 @@ class NexusTemplate:
             )
         )
 
+        # Door and key types of each level door, and the indexes into
+        # level_doors of the doors opened by each key type.
+        self.level_door_types = tuple(
+            data["doors"][eid]["door"] for eid in self.level_doors
+        )
+        self.level_key_types = tuple(
+            data["doors"][eid]["key_get"] for eid in self.level_doors
+        )
+        self.key_door_indexes = tuple(
+            tuple(
+                ind
+                for ind, door in enumerate(self.level_door_types)
+                if DOOR_INFO[door][1] == key_type
+            )
+            for key_type in range(4)
+        )
+
     def display_label(self) -> str:
         """Return a display label to use in UIs"""
         return f"{self.name} ({len(self.level_doors)} levels)"
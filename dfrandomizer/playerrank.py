@@ -2,11 +2,27 @@
 Module defining logic to compute player and level ranks.
 """
 
+import heapq
+import itertools
 import logging
 import math
-from typing import Dict, List, Set, Tuple
+import multiprocessing
+import multiprocessing.connection
+from multiprocessing.shared_memory import SharedMemory
+import time
+from typing import (
+    Dict,
+    Iterable,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Union,
+)
 
-from sklearn.linear_model import LinearRegression  # type: ignore
+import numpy as np
 
 # Maps that cannot be part of the randomizer even if otherwise eligible. They
 # will also be ignored for player rank and difficulty calculations.
@@ -17,6 +33,51 @@ PLAYER_ALPHA = 0.90
 REGRESSION_SIGMOID_MULT = 2.0
 REGRESSION_WEIGHTING = 0.4
 
+RANK_ENGINES = ("numpy", "python")
+REGRESSION_MODELS = ("linear", "huber")
+
+# Schemes to speed up convergence of the rank iteration. "none" is the
+# original Jacobi style iteration; "relaxation" and "anderson" instead update
+# players from the freshly computed level scores (a Gauss-Seidel sweep) and
+# then apply over-relaxation or Anderson mixing to the sweep.
+RANK_ACCELERATIONS = ("none", "relaxation", "anderson")
+DEFAULT_RELAXATION = 1.4
+ANDERSON_DEPTH = 5
+
+# Whenever the residual of a relaxed iteration grows, the excess of the
+# relaxation factor over 1 is scaled by this factor.
+RELAXATION_BACKOFF = 0.5
+
+# Iteration fails once the residual has grown this many iterations in a row.
+DIVERGENCE_ITERATIONS = 20
+
+# Iteration stops once the summed squared change of all scores drops below
+# this tolerance.
+DEFAULT_TOLERANCE = 1e-11
+
+# With truncation enabled, alpha sums only sort the K leading elements of each
+# list where alpha^K is below the truncation error; the remaining elements are
+# folded in by their mean. This bounds the error of each sum by the
+# truncation error as all scores are between 0 and 1.
+DEFAULT_TRUNCATION_ERROR = 1e-6
+
+# Incremental updates stop propagating through a level or player once its
+# score changes by less than this, and fall back to a full recompute once the
+# affected region covers more than this fraction of all levels and players.
+INCREMENTAL_TOLERANCE = 1e-7
+INCREMENTAL_MAX_FRACTION = 0.25
+
+# Levels whose score moves by more than this under the refit SS regression
+# are recomputed by incremental updates, see update_ranks.
+INCREMENTAL_DRIFT_TOLERANCE = 1e-5
+
+# Scores that change by more than this in an iteration are counted as moved
+# in a RankReport.
+REPORT_MOVE_THRESHOLD = 1e-6
+
+RankMappings = Tuple[Dict[str, float], Dict[int, float]]
+InitialRanks = Tuple[Mapping[str, float], Mapping]
+
 LOGGER = logging.getLogger(__name__)
 
 
@@ -37,11 +98,56 @@ def alpha_sum(A: List[float], alpha: float, s_init: float = 0.0) -> float:
     return s
 
 
+def truncation_size(alpha: float, error: float) -> int:
+    """Return the number of leading elements K of an alpha sum that must be
+    computed exactly so that the weight of the remaining ones, alpha^K, is at
+    most `error`.
+    """
+    return max(1, math.ceil(math.log(error) / math.log(alpha)))
+
+
+def alpha_sum_top_k(
+    A: Sequence[float],
+    alpha: float,
+    s_init: float = 0.0,
+    *,
+    k: int,
+    reverse: bool = False,
+) -> float:
+    """
+    Approximate alpha_sum(sorted(A, reverse=reverse), alpha, s_init) by
+    selecting only the `k` leading elements and folding in the rest by their
+    mean. The error is at most alpha^k times the spread of A.
+    """
+    if len(A) <= k:
+        return alpha_sum(sorted(A, reverse=reverse), alpha, s_init=s_init)
+
+    # A heap based selection only beats sorting in C once A is much larger
+    # than k.
+    if len(A) > 16 * k:
+        head = heapq.nlargest(k, A) if reverse else heapq.nsmallest(k, A)
+    else:
+        head = sorted(A, reverse=reverse)[:k]
+    tail_mean = (math.fsum(A) - math.fsum(head)) / (len(A) - k)
+    tail_weight = math.pow(alpha, len(A) - k)
+    return alpha_sum(
+        head, alpha, s_init=tail_mean * (1 - tail_weight) + s_init * tail_weight
+    )
+
+
 def predict_sses(
-    levels: Dict[str, dict], solvers: Dict[str, List[int]]
+    levels: Dict[str, dict],
+    solvers: Mapping[str, Sequence[int]],
+    *,
+    regression: str = "linear",
 ) -> Dict[str, float]:
     """Compute linear regression for expected number of SSes based on
     level ID and if the level was the daily.
+
+    `regression` selects the model from REGRESSION_MODELS. "linear" is an
+    ordinary least squares fit solved in closed form. "huber" fits a Huber
+    regressor that is less sensitive to outlier levels and requires
+    scikit-learn, which is only imported when it is selected.
     """
     dataset: Tuple[List[dict], List[dict]] = ([], [])
     for level, level_solvers in solvers.items():
@@ -49,25 +155,137 @@ def predict_sses(
         dataset[1 if leveldata["was_daily"] else 0].append(
             {
                 "level": level,
-                "x": [leveldata["atlas_id"]],
+                "x": leveldata["atlas_id"],
                 "y": len(level_solvers),
             }
         )
 
+    if regression == "linear":
+        fit = _fit_least_squares
+    elif regression == "huber":
+        fit = _fit_huber
+    else:
+        raise ValueError(f"unknown regression model {regression!r}")
+
     result: Dict[str, float] = {}
     for dset in dataset:
-        x = [datum["x"] for datum in dset]
-        y = [datum["y"] for datum in dset]
+        if not dset:
+            continue
+        x = np.array([datum["x"] for datum in dset], dtype=np.float64)
+        y = np.array([datum["y"] for datum in dset], dtype=np.float64)
         lev = [datum["level"] for datum in dset]
-        result.update(zip(lev, LinearRegression().fit(x, y).predict(x)))
+        result.update(zip(lev, fit(x, y).tolist()))
 
     return result
 
 
+def _fit_least_squares(x: np.ndarray, y: np.ndarray) -> np.ndarray:
+    """Fit y ~ slope * x + intercept by ordinary least squares and return the
+    predictions at `x`. If all `x` are equal the slope is taken to be zero.
+    """
+    x_mean = x.mean()
+    y_mean = y.mean()
+    x_centered = x - x_mean
+    x_ssq = float(x_centered @ x_centered)
+    slope = float(x_centered @ (y - y_mean)) / x_ssq if x_ssq > 0 else 0.0
+    return y_mean + slope * x_centered
+
+
+def _fit_huber(x: np.ndarray, y: np.ndarray) -> np.ndarray:
+    """Fit y ~ x with a Huber regressor and return the predictions at `x`.
+    scikit-learn is an optional dependency only needed by this model.
+    """
+    try:
+        # pylint: disable=import-outside-toplevel
+        from sklearn.linear_model import HuberRegressor  # type: ignore
+    except ImportError as exc:
+        raise ImportError(
+            "the huber regression model requires scikit-learn, install it "
+            "with 'pip install scikit-learn' or use the linear model"
+        ) from exc
+
+    features = x.reshape(-1, 1)
+    return HuberRegressor().fit(features, y).predict(features)
+
+
+class RankReport:
+    """
+    Instrumentation of a single compute_ranks or update_ranks run, filled in
+    when passed as their `report` argument.
+
+    Each iteration records the time taken by the level and player half-steps
+    and by the whole iteration, the summed squared change ("residual") and
+    largest change of the level and player scores, and how many of each
+    moved by more than `move_threshold`. Residuals of accelerated schemes are
+    those of the plain sweep, before relaxation or mixing.
+    """
+
+    def __init__(self, move_threshold: float = REPORT_MOVE_THRESHOLD) -> None:
+        self.move_threshold = move_threshold
+        self.settings: Dict[str, object] = {}
+        self.iterations: List[Dict[str, float]] = []
+        self.converged = False
+        self.wall_time = 0.0
+
+    def record_iteration(
+        self,
+        *,
+        level_time: float,
+        player_time: float,
+        iteration_time: float,
+        level_changes: np.ndarray,
+        player_changes: np.ndarray,
+    ) -> None:
+        """Record an iteration given the absolute change of each level and
+        player score.
+        """
+        self.iterations.append(
+            {
+                "time": iteration_time,
+                "level_time": level_time,
+                "player_time": player_time,
+                "level_residual": float(level_changes @ level_changes),
+                "player_residual": float(player_changes @ player_changes),
+                "level_max_change": float(level_changes.max(initial=0.0)),
+                "player_max_change": float(player_changes.max(initial=0.0)),
+                "levels_moved": int(
+                    np.count_nonzero(level_changes > self.move_threshold)
+                ),
+                "players_moved": int(
+                    np.count_nonzero(player_changes > self.move_threshold)
+                ),
+            }
+        )
+
+    def to_dict(self) -> dict:
+        """Return the report as a JSON serializable dict."""
+        iteration_time = sum(iteration["time"] for iteration in self.iterations)
+        return {
+            **self.settings,
+            "move_threshold": self.move_threshold,
+            "converged": self.converged,
+            "wall_time": self.wall_time,
+            "setup_time": max(0.0, self.wall_time - iteration_time),
+            "num_iterations": len(self.iterations),
+            "iterations": self.iterations,
+        }
+
+
 def compute_ranks(
     levels: Dict[str, dict],
-    solvers: Dict[str, List[int]],
-) -> Tuple[Dict[str, float], Dict[int, float]]:
+    solvers: Mapping[str, Sequence[int]],
+    *,
+    engine: str = "numpy",
+    initial: Optional[InitialRanks] = None,
+    tolerance: float = DEFAULT_TOLERANCE,
+    max_iterations: Optional[int] = None,
+    acceleration: str = "none",
+    relaxation: float = DEFAULT_RELAXATION,
+    regression: str = "linear",
+    truncation_error: Optional[float] = None,
+    processes: int = 1,
+    report: Optional[RankReport] = None,
+) -> RankMappings:
     """Calculate and return a tuple of two mappings using an iterative
     method.  The first maps level IDs to difficulties (between 0.0 and 1.0)
     The second maps player IDs to a skill (between 0.0 and 1.0).
@@ -78,8 +296,1033 @@ def compute_ranks(
     2. A level being solved by more players should decrease its difficulty
     3. A players skill should be affected most by the most difficulty levels they solve
     4. A level's difficulty should be affected most by the lowest skilled player to solve it
+
+    `engine` selects the implementation from RANK_ENGINES. "numpy" runs the
+    iteration over arrays while "python" is the original dict based
+    implementation. Both produce the same ranks up to floating point rounding.
+
+    If `initial` is given as a (level ranks, player ranks) tuple, such as the
+    result of a previous run, the iteration starts from those ranks for any
+    level or player present in them. Player IDs may be given as strings as
+    they are after a round trip through JSON.
+
+    Iteration stops once the summed squared change of all ranks is below
+    `tolerance` or after `max_iterations` iterations. `acceleration` picks a
+    scheme from RANK_ACCELERATIONS; the numpy engine supports all of them
+    while the python engine only supports "none". `relaxation` is the
+    over-relaxation factor used by the "relaxation" scheme. It is damped
+    whenever the residual grows and relaxed scores are clipped to [0, 1].
+    The numpy engine raises a RuntimeError if the scores become invalid or
+    the residual keeps growing. `regression` selects the SS regression model
+    used by predict_sses.
+
+    If `truncation_error` is given, each alpha sum only sorts as many leading
+    scores as needed for the remaining ones to carry at most this much
+    weight, and folds those in by their mean. This bounds the cost of levels
+    and players with thousands of solves.
+
+    With `processes` above one the numpy engine shards each half-step across
+    that many worker processes, see ParallelRankProblem. The ranks are
+    identical to those of a single process run.
+
+    If a RankReport is given as `report` it is filled in with the settings,
+    per iteration timings and residuals, and total wall time of the run.
     """
-    expected_level_sses = predict_sses(levels, solvers)
+    if acceleration not in RANK_ACCELERATIONS:
+        raise ValueError(f"unknown rank acceleration {acceleration!r}")
+    if engine == "python":
+        if acceleration != "none":
+            raise ValueError("the python rank engine does not support acceleration")
+        if processes > 1:
+            raise ValueError("the python rank engine does not support processes")
+    elif engine != "numpy":
+        raise ValueError(f"unknown rank engine {engine!r}")
+
+    start_time = time.perf_counter()
+    if report is not None:
+        report.settings.update(
+            engine=engine,
+            acceleration=acceleration,
+            regression=regression,
+            truncation_error=truncation_error,
+            processes=processes,
+            tolerance=tolerance,
+            warm_start=initial is not None,
+        )
+    if engine == "numpy":
+        result = _compute_ranks_numpy(
+            levels,
+            solvers,
+            initial=initial,
+            tolerance=tolerance,
+            max_iterations=max_iterations,
+            acceleration=acceleration,
+            relaxation=relaxation,
+            regression=regression,
+            truncation_error=truncation_error,
+            processes=processes,
+            report=report,
+        )
+    else:
+        result = _compute_ranks_python(
+            levels,
+            solvers,
+            initial=initial,
+            tolerance=tolerance,
+            max_iterations=max_iterations,
+            regression=regression,
+            truncation_error=truncation_error,
+            report=report,
+        )
+    if report is not None:
+        report.wall_time = time.perf_counter() - start_time
+    return result
+
+
+def update_ranks(
+    levels: Dict[str, dict],
+    solvers: Mapping[str, Sequence[int]],
+    previous: InitialRanks,
+    changed_levels: Iterable[str],
+    changed_players: Iterable[int],
+    *,
+    tolerance: float = INCREMENTAL_TOLERANCE,
+    drift_tolerance: float = INCREMENTAL_DRIFT_TOLERANCE,
+    max_fraction: float = INCREMENTAL_MAX_FRACTION,
+    fallback_tolerance: float = DEFAULT_TOLERANCE,
+    max_iterations: Optional[int] = None,
+    acceleration: str = "none",
+    regression: str = "linear",
+    truncation_error: Optional[float] = None,
+    processes: int = 1,
+    report: Optional[RankReport] = None,
+) -> RankMappings:
+    """Incrementally update the `previous` result of compute_ranks after the
+    solvers of `changed_levels` changed, adding or removing the solves of
+    `changed_players`.
+
+    Starting from the changed levels and players, and any level or player
+    missing from `previous`, scores are recomputed and changes propagated
+    along solver edges until no score moves by more than `tolerance`. Levels
+    and players outside the affected region keep their previous ranks.
+
+    The SS regression prior is refit over the updated solvers. Unchanged
+    levels whose score under the refit prior moves by more than
+    `drift_tolerance` join the affected region, so every level stays within
+    about `drift_tolerance` of a full recompute. Adding levels usually
+    shifts the regression enough to fall back to a full recompute.
+
+    If the affected region grows past `max_fraction` of all levels and
+    players this falls back to a full recompute with the numpy engine, warm
+    started from the scores so far. `fallback_tolerance`, `max_iterations`,
+    `acceleration` and `processes` are passed to it as to compute_ranks.
+
+    A `report` records the number of affected levels and players and, after
+    a fall back, the iterations of the full recompute.
+    """
+    if acceleration not in RANK_ACCELERATIONS:
+        raise ValueError(f"unknown rank acceleration {acceleration!r}")
+
+    start_time = time.perf_counter()
+    if report is not None:
+        report.settings.update(
+            engine="incremental",
+            acceleration=acceleration,
+            regression=regression,
+            truncation_error=truncation_error,
+            processes=processes,
+            tolerance=tolerance,
+            fallback_tolerance=fallback_tolerance,
+        )
+    problem = RankProblem(
+        levels, solvers, regression=regression, truncation_error=truncation_error
+    )
+    level_score, player_score = problem.initial_scores(previous)
+    previous_levels, previous_players = _normalize_initial(previous)
+
+    # The refit SS regression shifts the weight of every level a little, and
+    # adding levels can shift it a lot. Changed and new levels, and levels
+    # whose refit weight moves their score under the previous player skills
+    # by more than `drift_tolerance`, are recomputed with their refit weight.
+    # The remaining levels keep the weight implied by their previous rank.
+    refit_scores = problem.level_step(player_score)
+    changed_level_set = set(changed_levels)
+    refit = np.array(
+        [
+            level in changed_level_set or level not in previous_levels
+            for level in problem.level_ids
+        ],
+        dtype=bool,
+    )
+    refit |= np.abs(refit_scores - level_score) > drift_tolerance
+    level_weight = np.where(
+        refit, problem.level_weight, problem.level_weight * level_score / refit_scores
+    )
+    active_levels = np.flatnonzero(refit)
+    changed_player_set = set(changed_players)
+    active_players = np.array(
+        [
+            ind
+            for ind, player in enumerate(problem.player_ids.tolist())
+            if player in changed_player_set or player not in previous_players
+        ],
+        dtype=np.int64,
+    )
+
+    affected_levels = np.zeros(len(problem.level_ids), dtype=bool)
+    affected_players = np.zeros(len(problem.player_ids), dtype=bool)
+    max_affected = max_fraction * (len(problem.level_ids) + len(problem.player_ids))
+    while len(active_levels) or len(active_players):
+        if len(active_levels):
+            new_scores = level_weight[active_levels] * problem.level_subset_factor(
+                active_levels, player_score
+            )
+            moved = active_levels[
+                np.abs(new_scores - level_score[active_levels]) > tolerance
+            ]
+            level_score[active_levels] = new_scores
+            affected_levels[active_levels] = True
+            active_players = np.union1d(active_players, problem.level_neighbours(moved))
+            active_levels = active_levels[:0]
+
+        if len(active_players):
+            new_scores = problem.player_subset_step(active_players, level_score)
+            moved = active_players[
+                np.abs(new_scores - player_score[active_players]) > tolerance
+            ]
+            player_score[active_players] = new_scores
+            affected_players[active_players] = True
+            active_levels = problem.player_neighbours(moved)
+            active_players = active_players[:0]
+
+        num_affected = int(affected_levels.sum() + affected_players.sum())
+        if num_affected > max_affected:
+            LOGGER.info(
+                "Incremental update affected %d scores, recomputing all ranks",
+                num_affected,
+            )
+            if report is not None:
+                report.settings["fell_back"] = True
+            if processes <= 1:
+                result = _iterate_ranks(
+                    problem,
+                    level_score,
+                    player_score,
+                    tolerance=fallback_tolerance,
+                    max_iterations=max_iterations,
+                    acceleration=acceleration,
+                    relaxation=DEFAULT_RELAXATION,
+                    report=report,
+                )
+            else:
+                with ParallelRankProblem(problem, processes) as parallel_problem:
+                    result = _iterate_ranks(
+                        parallel_problem,
+                        level_score,
+                        player_score,
+                        tolerance=fallback_tolerance,
+                        max_iterations=max_iterations,
+                        acceleration=acceleration,
+                        relaxation=DEFAULT_RELAXATION,
+                        report=report,
+                    )
+            if report is not None:
+                report.wall_time = time.perf_counter() - start_time
+            return result
+
+    LOGGER.info(
+        "Incremental update affected %d levels and %d players",
+        int(affected_levels.sum()),
+        int(affected_players.sum()),
+    )
+    if report is not None:
+        report.settings.update(
+            fell_back=False,
+            affected_levels=int(affected_levels.sum()),
+            affected_players=int(affected_players.sum()),
+        )
+        report.converged = True
+        report.wall_time = time.perf_counter() - start_time
+    return (
+        dict(zip(problem.level_ids, level_score.tolist())),
+        dict(zip(problem.player_ids.tolist(), player_score.tolist())),
+    )
+
+
+def naive_difficulties(
+    solver_counts: np.ndarray, expected_sses: np.ndarray
+) -> np.ndarray:
+    """Vectorized naive difficulty of levels based on how many SSes they have
+    compared to how many the regression expected them to have.
+    """
+    ss_count = np.maximum(1, solver_counts)
+    expected_ss_count = np.maximum(1, expected_sses).astype(np.float64)
+
+    # sigmoid(ln(a) - ln(b))
+    x = np.log(expected_ss_count) - np.log(ss_count)
+    return 1.0 / (1.0 + np.exp(-x * REGRESSION_SIGMOID_MULT))
+
+
+class RankProblem:  # pylint: disable=too-many-instance-attributes
+    """
+    The solver graph of a dataset in array form. Each solver entry is an edge
+    of the sparse player-by-level incidence matrix; edges are stored twice,
+    grouped by level (CSR order) and grouped by player (CSC order).
+
+    Every iteration sorts each group by score, so the rank of an edge within
+    its group, and therefore its alpha_sum weight, depends only on the group
+    sizes. Those weights are precomputed once here.
+
+    If `truncation_error` is given the alpha sums of large groups are
+    truncated as described for DEFAULT_TRUNCATION_ERROR.
+    """
+
+    def __init__(
+        self,
+        levels: Dict[str, dict],
+        solvers: Mapping[str, Sequence[int]],
+        *,
+        regression: str = "linear",
+        truncation_error: Optional[float] = None,
+    ) -> None:
+        self.level_ids = list(solvers)
+        self.level_degrees = np.fromiter(
+            (len(players) for players in solvers.values()),
+            dtype=np.int64,
+            count=len(self.level_ids),
+        )
+        edge_players = np.fromiter(
+            itertools.chain.from_iterable(solvers.values()),
+            dtype=np.int64,
+            count=int(self.level_degrees.sum()),
+        )
+
+        # Number players in order of first appearance so that results come
+        # out in the same order as from the dict based implementation.
+        player_ids, first_index, edge_player = np.unique(
+            edge_players, return_index=True, return_inverse=True
+        )
+        order = np.argsort(first_index)
+        renumber = np.empty_like(order)
+        renumber[order] = np.arange(len(order))
+        self.player_ids = player_ids[order]
+
+        self.level_edge_group = np.repeat(
+            np.arange(len(self.level_ids)), self.level_degrees
+        )
+        self.level_edge_player = renumber[edge_player.reshape(-1)]
+
+        player_order = np.argsort(self.level_edge_player, kind="stable")
+        self.player_degrees = np.bincount(
+            self.level_edge_player, minlength=len(self.player_ids)
+        )
+        self.player_edge_group = self.level_edge_player[player_order]
+        self.player_edge_level = self.level_edge_group[player_order]
+
+        self.level_indptr = np.concatenate(([0], np.cumsum(self.level_degrees)))
+        self.player_indptr = np.concatenate(([0], np.cumsum(self.player_degrees)))
+
+        self.level_top_k: Optional[int] = None
+        self.player_top_k: Optional[int] = None
+        if truncation_error is not None:
+            self.level_top_k = truncation_size(LEVEL_ALPHA, truncation_error)
+            self.player_top_k = truncation_size(PLAYER_ALPHA, truncation_error)
+        self.level_sums = _GroupedAlphaSum(
+            self.level_indptr,
+            self.level_edge_player,
+            len(self.player_ids),
+            LEVEL_ALPHA,
+            top_k=self.level_top_k,
+        )
+        self.player_sums = _GroupedAlphaSum(
+            self.player_indptr,
+            self.player_edge_level,
+            len(self.level_ids),
+            PLAYER_ALPHA,
+            top_k=self.player_top_k,
+        )
+
+        self.level_edge_weights = _alpha_weights(
+            self.level_degrees, LEVEL_ALPHA, top_k=self.level_top_k
+        )
+        self.player_edge_weights = _alpha_weights(
+            self.player_degrees, PLAYER_ALPHA, top_k=self.player_top_k
+        )
+        self.level_tail_weights = np.power(LEVEL_ALPHA, self.level_degrees)
+
+        expected_level_sses = predict_sses(levels, solvers, regression=regression)
+        self.naive_difficulty = naive_difficulties(
+            self.level_degrees,
+            np.array([expected_level_sses[level] for level in self.level_ids]),
+        )
+        self.level_weight = np.power(self.naive_difficulty, REGRESSION_WEIGHTING)
+
+    def initial_scores(
+        self, initial: Optional[InitialRanks] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Return the starting level and player scores. These are the naive
+        difficulty for levels and 0.5 for players unless overridden by
+        `initial`.
+        """
+        if initial is None:
+            return (
+                np.array(self.naive_difficulty),
+                np.full(len(self.player_ids), 0.5),
+            )
+
+        initial_levels, initial_players = _normalize_initial(initial)
+        level_score = np.fromiter(
+            (
+                initial_levels.get(level, difficulty)
+                for level, difficulty in zip(
+                    self.level_ids, self.naive_difficulty.tolist()
+                )
+            ),
+            dtype=np.float64,
+            count=len(self.level_ids),
+        )
+        player_score = np.fromiter(
+            (initial_players.get(player, 0.5) for player in self.player_ids.tolist()),
+            dtype=np.float64,
+            count=len(self.player_ids),
+        )
+        return level_score, player_score
+
+    def level_step(self, player_score: np.ndarray) -> np.ndarray:
+        """Compute new level difficulties from player skills. A level's
+        difficulty is dominated by the lowest player ranks to have SS'ed it.
+        """
+        base_score = self.level_tail_weights + self.level_sums(player_score)
+        return self.level_weight * np.power(base_score, 1.0 - REGRESSION_WEIGHTING)
+
+    def player_step(self, level_score: np.ndarray) -> np.ndarray:
+        """Compute new player skills from level difficulties. A player's
+        ranking is dominated by the hardest maps they have SS'ed.
+        """
+        return -self.player_sums(-level_score)
+
+    def level_subset_factor(
+        self, groups: np.ndarray, player_score: np.ndarray
+    ) -> np.ndarray:
+        """Compute the player skill dependent factor of the difficulty of only
+        the levels indexed by `groups`. The difficulty is this factor times
+        the level's weight. Sums are truncated like those of level_step.
+        """
+        edges = _group_edges(self.level_indptr, groups)
+        local_group = np.repeat(np.arange(len(groups)), self.level_degrees[groups])
+        scores = player_score[self.level_edge_player[edges]]
+        scores = scores[np.lexsort((scores, local_group))]
+        base_score = self.level_tail_weights[groups] + np.bincount(
+            local_group,
+            weights=self.level_edge_weights[edges] * scores,
+            minlength=len(groups),
+        )
+        return np.power(base_score, 1.0 - REGRESSION_WEIGHTING)
+
+    def player_subset_step(
+        self, groups: np.ndarray, level_score: np.ndarray
+    ) -> np.ndarray:
+        """Compute new skills of only the players indexed by `groups`. Sums
+        are truncated like those of player_step.
+        """
+        edges = _group_edges(self.player_indptr, groups)
+        local_group = np.repeat(np.arange(len(groups)), self.player_degrees[groups])
+        scores = level_score[self.player_edge_level[edges]]
+        scores = scores[np.lexsort((-scores, local_group))]
+        return np.bincount(
+            local_group,
+            weights=self.player_edge_weights[edges] * scores,
+            minlength=len(groups),
+        )
+
+    def level_neighbours(self, groups: np.ndarray) -> np.ndarray:
+        """Return the players that solved any of the levels in `groups`."""
+        return np.unique(
+            self.level_edge_player[_group_edges(self.level_indptr, groups)]
+        )
+
+    def player_neighbours(self, groups: np.ndarray) -> np.ndarray:
+        """Return the levels solved by any of the players in `groups`."""
+        return np.unique(
+            self.player_edge_level[_group_edges(self.player_indptr, groups)]
+        )
+
+
+def _group_edges(indptr: np.ndarray, groups: np.ndarray) -> np.ndarray:
+    """Return the indices of all edges belonging to `groups`, in group order,
+    where group i owns edges indptr[i] to indptr[i + 1].
+    """
+    starts = indptr[groups]
+    lengths = indptr[groups + 1] - starts
+    offsets = np.repeat(starts - (np.cumsum(lengths) - lengths), lengths)
+    return offsets + np.arange(int(lengths.sum()))
+
+
+class _GroupedAlphaSum:  # pylint: disable=too-many-instance-attributes
+    """
+    Computes the alpha_sum (without its s_init term) of every group of edges
+    of one orientation of a RankProblem, with each group's values sorted in
+    ascending order. Group i owns edges indptr[i] to indptr[i + 1], and the
+    value of an edge is the vertex value indexed by `edge_values`.
+
+    Groups are sorted together by a single integer sort. Rather than sorting
+    the edge values directly, the vertex values are ranked once and each edge
+    is keyed by group * num_values + rank.
+
+    If `top_k` is given, groups with more than `top_k` edges are excluded
+    from the sort. Their values are instead gathered into padded matrices,
+    one per power of two of group size, from which the leading `top_k`
+    values of each row are selected with a partial sort. The remaining
+    values are folded in by their mean.
+    """
+
+    def __init__(
+        self,
+        indptr: np.ndarray,
+        edge_values: np.ndarray,
+        num_values: int,
+        alpha: float,
+        *,
+        top_k: Optional[int] = None,
+    ) -> None:
+        degrees = indptr[1:] - indptr[:-1]
+        self.num_groups = len(degrees)
+
+        sorted_groups = np.arange(self.num_groups)
+        self.buckets: List[Tuple[np.ndarray, np.ndarray]] = []
+        self.top_k = 0
+        if top_k is not None:
+            sorted_groups = np.flatnonzero(degrees <= top_k)
+            self.top_k = top_k
+            large_groups = np.flatnonzero(degrees > top_k)
+            buckets = np.ceil(np.log2(degrees[large_groups])).astype(np.int64)
+            for bucket in np.unique(buckets).tolist():
+                groups = large_groups[buckets == bucket]
+                # Pad rows with an index to the +inf sentinel appended to the
+                # values so that padding never enters the leading values.
+                columns = np.arange(1 << bucket)
+                matrix = indptr[groups, None] + columns
+                matrix = np.where(
+                    columns < degrees[groups, None],
+                    edge_values[np.minimum(matrix, len(edge_values) - 1)],
+                    num_values,
+                )
+                self.buckets.append((groups, matrix))
+
+            large_edges = _group_edges(indptr, large_groups)
+            self.large_edge_group = np.repeat(large_groups, degrees[large_groups])
+            self.large_edge_values = edge_values[large_edges]
+            self.large_tail_weights = np.power(alpha, top_k) - np.power(alpha, degrees)
+            self.large_tail_lengths = np.maximum(1, degrees - top_k)
+        self.head_weights = (1 - alpha) * np.power(alpha, np.arange(self.top_k))
+
+        sorted_edges = _group_edges(indptr, sorted_groups)
+        self.sorted_edge_group = np.repeat(sorted_groups, degrees[sorted_groups])
+        self.sorted_edge_values = edge_values[sorted_edges]
+        self.sorted_edge_key_base = self.sorted_edge_group * num_values
+        self.sorted_edge_weights = _alpha_weights(degrees[sorted_groups], alpha)
+
+    def __call__(self, values: np.ndarray) -> np.ndarray:
+        order = np.argsort(values)
+        ranks = np.empty_like(order)
+        ranks[order] = np.arange(len(order))
+        keys = self.sorted_edge_key_base + ranks[self.sorted_edge_values]
+        keys.sort()
+        # bincount returns ints rather than floats if there are no edges.
+        sums = np.bincount(
+            self.sorted_edge_group,
+            weights=self.sorted_edge_weights
+            * values[order][keys - self.sorted_edge_key_base],
+            minlength=self.num_groups,
+        ).astype(np.float64, copy=False)
+        if not self.buckets:
+            return sums
+
+        top_k = self.top_k
+        padded_values = np.append(values, np.inf)
+        head_sums = np.zeros(self.num_groups)
+        for groups, matrix in self.buckets:
+            head = np.partition(padded_values[matrix], top_k - 1, axis=1)[:, :top_k]
+            head.sort(axis=1)
+            # Summed per row rather than by a matrix product, whose rounding
+            # can depend on the number of rows, so that any split of the groups
+            # gives the same sums.
+            sums[groups] = (head * self.head_weights).sum(axis=1)
+            head_sums[groups] = head.sum(axis=1)
+
+        totals = np.bincount(
+            self.large_edge_group,
+            weights=values[self.large_edge_values],
+            minlength=self.num_groups,
+        )
+        tail_means = (totals - head_sums) / self.large_tail_lengths
+        for groups, _ in self.buckets:
+            sums[groups] += tail_means[groups] * self.large_tail_weights[groups]
+        return sums
+
+
+def _alpha_weights(
+    degrees: np.ndarray, alpha: float, *, top_k: Optional[int] = None
+) -> np.ndarray:
+    """Return the alpha_sum weight (1-alpha)*alpha^i of each edge, where i is
+    the rank of the edge within its group and `degrees` are the group sizes.
+
+    If `top_k` is given, edges past the leading `top_k` of a group instead
+    share the weight of the truncated tail evenly, matching the truncated
+    sums of _GroupedAlphaSum.
+    """
+    starts = np.cumsum(degrees) - degrees
+    ranks = np.arange(int(degrees.sum())) - np.repeat(starts, degrees)
+    weights = (1 - alpha) * np.power(alpha, ranks)
+    if top_k is not None:
+        edge_degrees = np.repeat(degrees, degrees)
+        tail = ranks >= top_k
+        weights[tail] = (
+            np.power(alpha, top_k) - np.power(alpha, edge_degrees[tail])
+        ) / (edge_degrees[tail] - top_k)
+    return weights
+
+
+class AndersonMixer:
+    """
+    Anderson mixing (type II Anderson acceleration) of a fixed-point
+    iteration x <- g(x). Each call to `mix` takes the current iterate and its
+    image and returns the next iterate, extrapolated from the last `depth`
+    steps. History is discarded whenever the residual grows so that a poor
+    extrapolation cannot derail convergence.
+    """
+
+    def __init__(self, depth: int = ANDERSON_DEPTH) -> None:
+        self.depth = depth
+        self.iterates: List[np.ndarray] = []
+        self.images: List[np.ndarray] = []
+        self.last_residual = math.inf
+
+    def mix(self, x: np.ndarray, gx: np.ndarray) -> np.ndarray:
+        """Return the next iterate given iterate `x` and its image `gx`."""
+        residual = gx - x
+        residual_ssq = float(residual @ residual)
+        if residual_ssq > self.last_residual:
+            self.iterates.clear()
+            self.images.clear()
+        self.last_residual = residual_ssq
+
+        self.iterates.append(x)
+        self.images.append(gx)
+        if len(self.iterates) > self.depth + 1:
+            self.iterates.pop(0)
+            self.images.pop(0)
+        if len(self.iterates) < 2:
+            return gx
+
+        images = np.stack(self.images, axis=1)
+        residuals = images - np.stack(self.iterates, axis=1)
+        image_deltas = np.diff(images, axis=1)
+        gamma = np.linalg.lstsq(np.diff(residuals, axis=1), residual, rcond=None)[0]
+        return np.clip(gx - image_deltas @ gamma, 0.0, 1.0)
+
+
+class _RankShard:  # pylint: disable=too-many-instance-attributes
+    """
+    The levels lo_level to hi_level and players lo_player to hi_player of a
+    RankProblem, updated by one worker process of a ParallelRankProblem.
+    Only the raw edge slices are held until `prepare` is called in the
+    worker, so that building the shard's alpha sums happens in parallel.
+    """
+
+    def __init__(
+        self,
+        problem: RankProblem,
+        level_range: Tuple[int, int],
+        player_range: Tuple[int, int],
+    ) -> None:
+        self.level_range = level_range
+        self.player_range = player_range
+        lo_level, hi_level = level_range
+        lo_player, hi_player = player_range
+        self.level_indptr = problem.level_indptr[lo_level : hi_level + 1]
+        self.level_edge_player = problem.level_edge_player[
+            self.level_indptr[0] : self.level_indptr[-1]
+        ]
+        self.player_indptr = problem.player_indptr[lo_player : hi_player + 1]
+        self.player_edge_level = problem.player_edge_level[
+            self.player_indptr[0] : self.player_indptr[-1]
+        ]
+        self.num_levels = len(problem.level_ids)
+        self.num_players = len(problem.player_ids)
+        self.level_top_k = problem.level_top_k
+        self.player_top_k = problem.player_top_k
+        self.level_tail_weights = problem.level_tail_weights[lo_level:hi_level]
+        self.level_weight = problem.level_weight[lo_level:hi_level]
+        self.level_sums: Optional[_GroupedAlphaSum] = None
+        self.player_sums: Optional[_GroupedAlphaSum] = None
+
+    def prepare(self) -> None:
+        """Build the alpha sums of the shard's levels and players."""
+        self.level_sums = _GroupedAlphaSum(
+            self.level_indptr - self.level_indptr[0],
+            self.level_edge_player,
+            self.num_players,
+            LEVEL_ALPHA,
+            top_k=self.level_top_k,
+        )
+        self.player_sums = _GroupedAlphaSum(
+            self.player_indptr - self.player_indptr[0],
+            self.player_edge_level,
+            self.num_levels,
+            PLAYER_ALPHA,
+            top_k=self.player_top_k,
+        )
+
+    def level_step(self, player_score: np.ndarray) -> np.ndarray:
+        """RankProblem.level_step restricted to the shard's levels."""
+        assert self.level_sums is not None
+        base_score = self.level_tail_weights + self.level_sums(player_score)
+        return self.level_weight * np.power(base_score, 1.0 - REGRESSION_WEIGHTING)
+
+    def player_step(self, level_score: np.ndarray) -> np.ndarray:
+        """RankProblem.player_step restricted to the shard's players."""
+        assert self.player_sums is not None
+        return -self.player_sums(-level_score)
+
+
+def _shard_ranges(indptr: np.ndarray, shards: int) -> List[Tuple[int, int]]:
+    """Split the groups of `indptr` into `shards` contiguous ranges holding
+    roughly the same number of edges each.
+    """
+    bounds = np.searchsorted(
+        indptr, np.linspace(0, indptr[-1], shards + 1)[1:-1], side="right"
+    )
+    bounds = np.concatenate(([0], bounds, [len(indptr) - 1])).tolist()
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def _shared_array(size: int) -> Tuple[SharedMemory, np.ndarray]:
+    """Allocate a float64 array of `size` elements in shared memory."""
+    shm = SharedMemory(create=True, size=max(1, size) * 8)
+    return shm, np.ndarray((size,), dtype=np.float64, buffer=shm.buf)
+
+
+def _rank_worker(
+    conn: multiprocessing.connection.Connection,
+    shard: _RankShard,
+    buffers: Dict[str, SharedMemory],
+    num_levels: int,
+    num_players: int,
+) -> None:
+    """Worker process loop of ParallelRankProblem. After preparing the shard,
+    each "level" or "player" command computes that half-step for the shard
+    from the shared input scores into the shared output scores. Every
+    command is acknowledged with None, or with the exception it raised. A
+    None command stops the worker.
+    """
+    arrays = {
+        name: np.ndarray(
+            (num_levels if name.startswith("level") else num_players,),
+            dtype=np.float64,
+            buffer=shm.buf,
+        )
+        for name, shm in buffers.items()
+    }
+    lo_level, hi_level = shard.level_range
+    lo_player, hi_player = shard.player_range
+    try:
+        for command in itertools.chain(["prepare"], iter(conn.recv, None)):
+            try:
+                if command == "prepare":
+                    shard.prepare()
+                elif command == "level":
+                    arrays["level_out"][lo_level:hi_level] = shard.level_step(
+                        arrays["player_in"]
+                    )
+                else:
+                    arrays["player_out"][lo_player:hi_player] = shard.player_step(
+                        arrays["level_in"]
+                    )
+                conn.send(None)
+            except Exception as exc:  # pylint: disable=broad-except
+                conn.send(exc)
+    finally:
+        del arrays
+        for shm in buffers.values():
+            shm.close()
+        conn.close()
+
+
+class ParallelRankProblem:
+    """
+    Runs the level and player half-steps of a RankProblem across `processes`
+    worker processes, each owning a contiguous shard of the levels and of the
+    players balanced by number of solves.
+
+    Score vectors are exchanged through shared memory rather than pickled:
+    each step copies its input scores into a shared buffer, every worker
+    writes its shard of the new scores into a shared output buffer, and only
+    a short command and acknowledgement pass through a pipe. Each shard sums
+    its groups exactly as RankProblem does, so results are identical to the
+    serial steps.
+
+    Use as a context manager so that the workers and shared memory are
+    released.
+    """
+
+    def __init__(self, problem: RankProblem, processes: int) -> None:
+        self.level_ids = problem.level_ids
+        self.player_ids = problem.player_ids
+        self.num_levels = len(problem.level_ids)
+        self.num_players = len(problem.player_ids)
+
+        self.buffers: Dict[str, SharedMemory] = {}
+        self.arrays: Dict[str, np.ndarray] = {}
+        for name in ("level_in", "level_out", "player_in", "player_out"):
+            size = self.num_levels if name.startswith("level") else self.num_players
+            self.buffers[name], self.arrays[name] = _shared_array(size)
+
+        self.conns: List[multiprocessing.connection.Connection] = []
+        self.workers: List[multiprocessing.Process] = []
+        try:
+            for level_range, player_range in zip(
+                _shard_ranges(problem.level_indptr, processes),
+                _shard_ranges(problem.player_indptr, processes),
+            ):
+                conn, child_conn = multiprocessing.Pipe()
+                worker = multiprocessing.Process(
+                    target=_rank_worker,
+                    args=(
+                        child_conn,
+                        _RankShard(problem, level_range, player_range),
+                        self.buffers,
+                        self.num_levels,
+                        self.num_players,
+                    ),
+                    daemon=True,
+                )
+                worker.start()
+                child_conn.close()
+                self.conns.append(conn)
+                self.workers.append(worker)
+            self._wait()
+        except BaseException:
+            self.close()
+            raise
+
+    def __enter__(self) -> "ParallelRankProblem":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def level_step(self, player_score: np.ndarray) -> np.ndarray:
+        """Parallel RankProblem.level_step."""
+        self.arrays["player_in"][:] = player_score
+        return self._run("level", "level_out")
+
+    def player_step(self, level_score: np.ndarray) -> np.ndarray:
+        """Parallel RankProblem.player_step."""
+        self.arrays["level_in"][:] = level_score
+        return self._run("player", "player_out")
+
+    def _run(self, command: str, output: str) -> np.ndarray:
+        """Run `command` on all workers and return a copy of `output`."""
+        for conn in self.conns:
+            conn.send(command)
+        self._wait()
+        return np.array(self.arrays[output])
+
+    def _wait(self) -> None:
+        """Wait for every worker to acknowledge, raising the first error."""
+        errors = [conn.recv() for conn in self.conns]
+        for error in errors:
+            if error is not None:
+                raise error
+
+    def close(self) -> None:
+        """Stop the workers and release the shared memory."""
+        for conn in self.conns:
+            try:
+                conn.send(None)
+            except OSError:
+                pass
+            conn.close()
+        for worker in self.workers:
+            worker.join()
+        self.conns.clear()
+        self.workers.clear()
+
+        self.arrays.clear()
+        for shm in self.buffers.values():
+            shm.close()
+            shm.unlink()
+        self.buffers.clear()
+
+
+def _normalize_initial(
+    initial: InitialRanks,
+) -> Tuple[Mapping[str, float], Dict[int, float]]:
+    """Return initial ranks with player IDs converted to ints."""
+    initial_levels, initial_players = initial
+    return initial_levels, {
+        int(player): score for player, score in initial_players.items()
+    }
+
+
+def _compute_ranks_numpy(
+    levels: Dict[str, dict],
+    solvers: Mapping[str, Sequence[int]],
+    *,
+    initial: Optional[InitialRanks],
+    tolerance: float,
+    max_iterations: Optional[int],
+    acceleration: str,
+    relaxation: float,
+    regression: str,
+    truncation_error: Optional[float],
+    processes: int,
+    report: Optional[RankReport],
+) -> RankMappings:
+    """Array based implementation of compute_ranks."""
+    problem = RankProblem(
+        levels, solvers, regression=regression, truncation_error=truncation_error
+    )
+    level_score, player_score = problem.initial_scores(initial)
+    if processes <= 1:
+        return _iterate_ranks(
+            problem,
+            level_score,
+            player_score,
+            tolerance=tolerance,
+            max_iterations=max_iterations,
+            acceleration=acceleration,
+            relaxation=relaxation,
+            report=report,
+        )
+    with ParallelRankProblem(problem, processes) as parallel_problem:
+        return _iterate_ranks(
+            parallel_problem,
+            level_score,
+            player_score,
+            tolerance=tolerance,
+            max_iterations=max_iterations,
+            acceleration=acceleration,
+            relaxation=relaxation,
+            report=report,
+        )
+
+
+def _iterate_ranks(
+    problem: Union[RankProblem, ParallelRankProblem],
+    level_score: np.ndarray,
+    player_score: np.ndarray,
+    *,
+    tolerance: float,
+    max_iterations: Optional[int],
+    acceleration: str,
+    relaxation: float,
+    report: Optional[RankReport] = None,
+) -> RankMappings:
+    """Iterate the rank computation of `problem` from the given scores until
+    convergence, recording each iteration in `report` if given.
+    """
+    num_levels = len(problem.level_ids)
+    mixer = AndersonMixer() if acceleration == "anderson" else None
+    if report is not None:
+        report.settings.update(
+            num_levels=num_levels, num_players=len(problem.player_ids)
+        )
+    last_residual = math.inf
+    growing_iterations = 0
+    for iteration in itertools.count(1):
+        start_time = time.perf_counter()
+        new_level_score = problem.level_step(player_score)
+        level_time = time.perf_counter()
+        if acceleration == "none":
+            new_player_score = problem.player_step(level_score)
+        else:
+            new_player_score = problem.player_step(new_level_score)
+        player_time = time.perf_counter()
+
+        level_changes = np.abs(level_score - new_level_score)
+        player_changes = np.abs(player_score - new_player_score)
+        level_ssq = float(level_changes @ level_changes)
+        player_ssq = float(player_changes @ player_changes)
+        residual = level_ssq + player_ssq
+        if not math.isfinite(residual):
+            raise RuntimeError(f"Rank iteration {iteration} produced invalid scores")
+        if residual > last_residual:
+            growing_iterations += 1
+            if growing_iterations >= DIVERGENCE_ITERATIONS:
+                raise RuntimeError(
+                    f"Rank iteration diverged, error grew for {growing_iterations} "
+                    f"iterations to {residual:g}"
+                )
+            # Over-relaxation overshoots while far from the fixed point, so
+            # damp it whenever the error grows.
+            relaxation = 1.0 + (relaxation - 1.0) * RELAXATION_BACKOFF
+        else:
+            growing_iterations = 0
+        last_residual = residual
+
+        if acceleration == "relaxation":
+            new_level_score = np.clip(
+                level_score + relaxation * (new_level_score - level_score), 0.0, 1.0
+            )
+            new_player_score = np.clip(
+                player_score + relaxation * (new_player_score - player_score),
+                0.0,
+                1.0,
+            )
+        elif mixer is not None:
+            mixed = mixer.mix(
+                np.concatenate((level_score, player_score)),
+                np.concatenate((new_level_score, new_player_score)),
+            )
+            new_level_score = mixed[:num_levels]
+            new_player_score = mixed[num_levels:]
+
+        level_score = new_level_score
+        player_score = new_player_score
+
+        if report is not None:
+            report.record_iteration(
+                level_time=level_time - start_time,
+                player_time=player_time - level_time,
+                iteration_time=time.perf_counter() - start_time,
+                level_changes=level_changes,
+                player_changes=player_changes,
+            )
+
+        LOGGER.info("Convergence errors %f %f", level_ssq, player_ssq)
+        if residual < tolerance:
+            if report is not None:
+                report.converged = True
+            break
+        if max_iterations is not None and iteration >= max_iterations:
+            LOGGER.warning(
+                "Ranks did not converge after %d iterations, error %g",
+                iteration,
+                residual,
+            )
+            break
+
+    return (
+        dict(zip(problem.level_ids, level_score.tolist())),
+        dict(zip(problem.player_ids.tolist(), player_score.tolist())),
+    )
+
+
+def _compute_ranks_python(
+    levels: Dict[str, dict],
+    solvers: Mapping[str, Sequence[int]],
+    *,
+    initial: Optional[InitialRanks],
+    tolerance: float,
+    max_iterations: Optional[int],
+    regression: str,
+    truncation_error: Optional[float],
+    report: Optional[RankReport],
+) -> RankMappings:
+    """Dict based reference implementation of compute_ranks."""
+    expected_level_sses = predict_sses(levels, solvers, regression=regression)
 
     # Filter out maps and compute inverse mapping from players to levels.
     player_map: Dict[int, List[str]] = {}
@@ -103,16 +1346,36 @@ def compute_ranks(
 
     player_score = {player: 0.5 for player in player_map}
 
+    if initial is not None:
+        initial_levels, initial_players = _normalize_initial(initial)
+        for level in level_set:
+            level_score[level] = initial_levels.get(level, level_score[level])
+        for player in player_map:
+            player_score[player] = initial_players.get(player, 0.5)
+
+    if report is not None:
+        report.settings.update(num_levels=len(level_set), num_players=len(player_map))
+
     # Iterate the calculations until they converge.
-    while True:
+    for iteration in itertools.count(1):
+        start_time = time.perf_counter()
+
         # Compute new level diffulty rankings based on previous player rankings.
         # A level's difficulty is dominated by the lowest player ranks to have
         # SS'ed it.
         new_level_score = {}
         for level in level_set:
             players = solvers[level]
-            scores = sorted(player_score[player] for player in players)
-            base_score = alpha_sum(scores, LEVEL_ALPHA, s_init=1)
+            if truncation_error is None:
+                scores = sorted(player_score[player] for player in players)
+                base_score = alpha_sum(scores, LEVEL_ALPHA, s_init=1)
+            else:
+                base_score = alpha_sum_top_k(
+                    [player_score[player] for player in players],
+                    LEVEL_ALPHA,
+                    s_init=1,
+                    k=truncation_size(LEVEL_ALPHA, truncation_error),
+                )
             new_level_score[level] = math.pow(
                 naive_difficulty(level), REGRESSION_WEIGHTING
             ) * math.pow(
@@ -120,15 +1383,28 @@ def compute_ranks(
                 1.0 - REGRESSION_WEIGHTING,
             )
 
+        level_time = time.perf_counter()
+
         # Compute new player rankings based on the previous level difficulties.
         # A player's ranking is dominated by the hardest maps they have SS'ed.
         new_player_score = {}
         for player, player_levels in player_map.items():
-            scores = sorted(
-                (level_score[level] for level in player_levels),
-                reverse=True,
-            )
-            new_player_score[player] = alpha_sum(scores, PLAYER_ALPHA, s_init=0)
+            if truncation_error is None:
+                scores = sorted(
+                    (level_score[level] for level in player_levels),
+                    reverse=True,
+                )
+                new_player_score[player] = alpha_sum(scores, PLAYER_ALPHA, s_init=0)
+            else:
+                new_player_score[player] = alpha_sum_top_k(
+                    [level_score[level] for level in player_levels],
+                    PLAYER_ALPHA,
+                    s_init=0,
+                    k=truncation_size(PLAYER_ALPHA, truncation_error),
+                    reverse=True,
+                )
+
+        player_time = time.perf_counter()
 
         # Compute squared difference between the last iteration to detect
         # convergence.
@@ -141,12 +1417,42 @@ def compute_ranks(
             for player, pscore in player_score.items()
         )
 
+        if report is not None:
+            report.record_iteration(
+                level_time=level_time - start_time,
+                player_time=player_time - level_time,
+                iteration_time=time.perf_counter() - start_time,
+                level_changes=np.abs(
+                    np.fromiter(level_score.values(), dtype=np.float64)
+                    - np.fromiter(
+                        (new_level_score[level] for level in level_score),
+                        dtype=np.float64,
+                    )
+                ),
+                player_changes=np.abs(
+                    np.fromiter(player_score.values(), dtype=np.float64)
+                    - np.fromiter(
+                        (new_player_score[player] for player in player_score),
+                        dtype=np.float64,
+                    )
+                ),
+            )
+
         level_score = new_level_score
         player_score = new_player_score
 
         # Wait for convergence and then exit.
         LOGGER.info("Convergence errors %f %f", level_ssq, player_ssq)
-        if level_ssq + player_ssq < 1e-11:
+        if level_ssq + player_ssq < tolerance:
+            if report is not None:
+                report.converged = True
+            break
+        if max_iterations is not None and iteration >= max_iterations:
+            LOGGER.warning(
+                "Ranks did not converge after %d iterations, error %g",
+                iteration,
+                level_ssq + player_ssq,
+            )
             break
 
     return level_score, player_score
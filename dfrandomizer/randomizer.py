@@ -2,11 +2,24 @@
 Module that performs level filtering, selection, and writing the actual
 level files.
 """
+import collections
 import dataclasses
 import logging
 import random
 import re
-from typing import Any, BinaryIO, Dict, List, Set
+import sys
+import threading
+from typing import (
+    Any,
+    BinaryIO,
+    Callable,
+    Dict,
+    FrozenSet,
+    Hashable,
+    List,
+    Optional,
+    Tuple,
+)
 
 from dustmaker.variable import (
     VariableArray,
@@ -15,8 +28,9 @@ from dustmaker.variable import (
 )
 
 from .dataset import DatasetManager
-from .level_sets import LEVELS_STOCK, LEVELS_CMP
-from .nexus_templates import LinearNexusTemplate, NexusTemplate, DOOR_INFO
+from .level_index import Bitset
+from .level_sets import LEVELS_STOCK
+from .nexus_templates import LinearNexusTemplate, NexusTemplate
 
 LOGGER = logging.getLogger(__name__)
 
@@ -28,6 +42,11 @@ ATLAS_MAX_SS_TIME_DEFAULT = "3:00.000"
 
 RANDOMIZER_SCRIPT_NAME = "nexus_controller.cpp"
 
+# Memory budget of a FilterCache, and the estimated overhead of each entry on
+# top of the size of its result tuple and key.
+FILTER_CACHE_BYTES = 64 * 2 ** 20
+FILTER_CACHE_ENTRY_BYTES = 256
+
 
 @dataclasses.dataclass
 class RandomizerData:
@@ -48,168 +67,232 @@ class RandomizerData:
         }
 
 
-def atlas_filter_levels(
-    dataset: DatasetManager,
-    nexus_template: NexusTemplate,  # pylint: disable=unused-argument
-    *,
-    min_ss=ATLAS_MIN_SS_DEFAULT,
-    max_ss=ATLAS_MAX_SS_DEFAULT,
-    min_time=ATLAS_MIN_SS_TIME_DEFAULT,
-    max_time=ATLAS_MAX_SS_TIME_DEFAULT,
-    cmp_filter: str = "",
-    daily_filter: str = "",
-    community_filter: str = "",
-    apple_filter: str = "",
-    cw_filter: str = "n",
-    ccw_filter: str = "n",
-    clunky_filter: str = "n",
-    backwards_filter: str = "n",
-    required_authors: str = "",
-    blocked_authors: str = "",
-    ss_users: str = "",
-    no_ss_users: str = "",
-    **_,
-) -> List[str]:
-    """
-    Return a list of candidate levels after applying the requested constraints.
-    """
-
-    def _parse_time_ms(tm):
-        """Convert a time in mm:ss.MMM format into milliseconds"""
-        m = re.match(r"(\d+):(\d+)\.(\d+)", tm)
-        if m:
-            return int(m.group(1)) * 60000 + int(m.group(2)) * 1000 + int(m.group(3))
-        m = re.match(r"(\d+)\.(\d+)", tm)
-        if m:
-            return int(m.group(1)) * 1000 + int(m.group(2))
-        try:
-            return int(tm)
-        except ValueError:
-            return -1
-
-    min_ss_num = int(ATLAS_MIN_SS_DEFAULT)
+def _parse_time_ms(tm: str) -> int:
+    """Convert a time in mm:ss.MMM format into milliseconds"""
+    m = re.match(r"(\d+):(\d+)\.(\d+)", tm)
+    if m:
+        return int(m.group(1)) * 60000 + int(m.group(2)) * 1000 + int(m.group(3))
+    m = re.match(r"(\d+)\.(\d+)", tm)
+    if m:
+        return int(m.group(1)) * 1000 + int(m.group(2))
     try:
-        min_ss_num = int(min_ss)
+        return int(tm)
     except ValueError:
-        pass
-    max_ss_num = int(ATLAS_MAX_SS_DEFAULT)
+        return -1
+
+
+def _parse_int(value: str, default: int) -> int:
+    """Parse an int, returning `default` if `value` is not one."""
     try:
-        max_ss_num = int(max_ss)
+        return int(value)
     except ValueError:
-        pass
+        return default
 
-    min_time_ms = _parse_time_ms(min_time)
-    max_time_ms = _parse_time_ms(max_time)
 
-    required_authors_st = set(
-        author.strip().lower()
-        for author in required_authors.split(",")
-        if author.strip()
-    )
-    blocked_authors_st = set(
-        author.strip().lower()
-        for author in blocked_authors.split(",")
-        if author.strip()
+def _parse_authors(authors: str) -> FrozenSet[str]:
+    """Parse a comma separated list of authors into lowercased names."""
+    return frozenset(
+        author.strip().lower() for author in authors.split(",") if author.strip()
     )
 
-    ss_users_list = []
-    no_ss_users_list = []
-    for user_id_str in ss_users.split(","):
-        try:
-            ss_users_list.append(int(user_id_str))
-        except ValueError:
-            pass
-    for user_id_str in no_ss_users.split(","):
+
+def _parse_users(users: str) -> FrozenSet[int]:
+    """Parse a comma separated list of user IDs, ignoring invalid ones."""
+    result = set()
+    for user_id_str in users.split(","):
         try:
-            no_ss_users_list.append(int(user_id_str))
+            result.add(int(user_id_str))
         except ValueError:
             pass
+    return frozenset(result)
 
-    community_levels = set()
-    want_trees: Dict[str, Set[str]] = {
-        "Main Nexus CW": set(),
-        "Main Nexus CCW": set(),
-        "clunknexusdx": set(),
-        "Main Nexus Backwards": set(),
-    }
-
-    def dfs(tree: Dict[str, dict]) -> Set[str]:
-        result = set()
-        for level, subtree in tree.items():
-            if not subtree:
-                result.add(level)
-                continue
-
-            subres = dfs(subtree)
-            if level in want_trees:
-                want_trees[level] = set(subres)
-            if len(result) > len(subres):
-                result.update(subres)
-            else:
-                subres.update(result)
-                result = subres
 
-        return result
+@dataclasses.dataclass(frozen=True)
+class AtlasFilterSpec:
+    """Parsed and normalised arguments of atlas_filter_levels. Specs compare
+    equal whenever the arguments select the same levels, so they can key a
+    FilterCache.
+    """
 
-    community_levels = dfs(dataset.community_levels)
+    min_ss: int
+    max_ss: int
+    min_time_ms: int
+    max_time_ms: int
+    properties: Tuple[Tuple[str, str], ...]
+    required_authors: FrozenSet[str]
+    blocked_authors: FrozenSet[str]
+    ss_users: FrozenSet[int]
+    no_ss_users: FrozenSet[int]
+
+    @classmethod
+    def from_args(
+        cls,
+        *,
+        min_ss=ATLAS_MIN_SS_DEFAULT,
+        max_ss=ATLAS_MAX_SS_DEFAULT,
+        min_time=ATLAS_MIN_SS_TIME_DEFAULT,
+        max_time=ATLAS_MAX_SS_TIME_DEFAULT,
+        cmp_filter: str = "",
+        daily_filter: str = "",
+        community_filter: str = "",
+        apple_filter: str = "",
+        cw_filter: str = "n",
+        ccw_filter: str = "n",
+        clunky_filter: str = "n",
+        backwards_filter: str = "n",
+        required_authors: str = "",
+        blocked_authors: str = "",
+        ss_users: str = "",
+        no_ss_users: str = "",
+        **_,
+    ) -> "AtlasFilterSpec":
+        """Parse the atlas filter arguments of a request."""
+        properties = {
+            "cmp": cmp_filter,
+            "daily": daily_filter,
+            "community": community_filter,
+            "apples": apple_filter,
+            "cw": cw_filter,
+            "ccw": ccw_filter,
+            "clunky": clunky_filter,
+            "backwards": backwards_filter,
+        }
+        return cls(
+            min_ss=_parse_int(min_ss, int(ATLAS_MIN_SS_DEFAULT)),
+            max_ss=_parse_int(max_ss, int(ATLAS_MAX_SS_DEFAULT)),
+            min_time_ms=_parse_time_ms(min_time),
+            max_time_ms=_parse_time_ms(max_time),
+            properties=tuple(
+                (name, value if value in ("y", "n") else "")
+                for name, value in properties.items()
+            ),
+            required_authors=_parse_authors(required_authors),
+            blocked_authors=_parse_authors(blocked_authors),
+            ss_users=_parse_users(ss_users),
+            no_ss_users=_parse_users(no_ss_users),
+        )
 
-    result = []
-    for level, leveldata in dataset.levels.items():
-        if not leveldata["atlas_id"]:
-            continue
-        if level in dataset.banned_levels:
-            continue
 
-        ss_count = len(dataset.solvers[level])
-        if ss_count < min_ss_num:
-            continue
-        if max_ss_num != -1 and max_ss_num < ss_count:
-            continue
+class FilterCache:
+    """
+    Thread-safe LRU cache of level filter results keyed by dataset, nexus
+    template and filter spec. Least recently used results are evicted once
+    the estimated size of all results exceeds `max_bytes`. Cached results
+    are shared between callers and must not be modified.
+    """
 
-        ss_time = leveldata["fastest_time"]
-        if ss_time < min_time_ms:
-            continue
-        if max_time_ms != -1 and max_time_ms < ss_time:
-            continue
+    def __init__(self, max_bytes: int = FILTER_CACHE_BYTES) -> None:
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.entries: "collections.OrderedDict[Hashable, Tuple[Any, int]]"
+        self.entries = collections.OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """Return the result cached under `key`, computing and caching it
+        with `compute` if it is not cached.
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        result = compute()
+        # Results are tuples of level IDs shared with the dataset or bitsets
+        # owning their buffer, so getsizeof covers what they add to memory.
+        size = sys.getsizeof(result) + sys.getsizeof(key) + FILTER_CACHE_ENTRY_BYTES
+        with self.lock:
+            if key not in self.entries and size <= self.max_bytes:
+                self.entries[key] = (result, size)
+                self.size += size
+                while self.size > self.max_bytes:
+                    _, (_, evicted_size) = self.entries.popitem(last=False)
+                    self.size -= evicted_size
+        return result
 
-        props = (
-            (cmp_filter, level in LEVELS_CMP),
-            (daily_filter, leveldata["was_daily"]),
-            (community_filter, level in community_levels),
-            (apple_filter, "hittable_apple" in leveldata["entities"]),
-            (cw_filter, level in want_trees["Main Nexus CW"]),
-            (ccw_filter, level in want_trees["Main Nexus CCW"]),
-            (clunky_filter, level in want_trees["clunknexusdx"]),
-            (backwards_filter, level in want_trees["Main Nexus Backwards"]),
-        )
+    def clear(self) -> None:
+        """Drop all cached results."""
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
 
-        require_props = [prop[1] for prop in props if prop[0] == "y"]
-        if require_props and not any(require_props):
-            continue
 
-        disallow_props = (prop[1] for prop in props if prop[0] == "n")
-        if any(disallow_props):
-            continue
+def _cached_filter(
+    filter_cache: Optional[FilterCache],
+    dataset: DatasetManager,
+    nexus_template: NexusTemplate,
+    spec: Hashable,
+    compute: Callable[[], Any],
+) -> Any:
+    """Return the result of `compute`, going through `filter_cache` if set."""
+    if filter_cache is None:
+        return compute()
+    key = (
+        dataset.rank_gen_time,
+        nexus_template.name,
+        nexus_template.level_doors,
+        spec,
+    )
+    return filter_cache.get(key, compute)
 
-        if (
-            required_authors_st
-            and leveldata["author"].lower() not in required_authors_st
-        ):
-            continue
 
-        if leveldata["author"].lower() in blocked_authors_st:
-            continue
+def atlas_filter_levels(
+    dataset: DatasetManager,
+    nexus_template: NexusTemplate,
+    *,
+    filter_cache: Optional[FilterCache] = None,
+    **filter_args,
+) -> List[str]:
+    """
+    Return a list of candidate levels after applying the requested constraints.
+    The constraints are described by AtlasFilterSpec.from_args. If
+    `filter_cache` is given results are memoized in it.
+    """
+    return dataset.level_index().levels(
+        _atlas_filter_bitset(dataset, nexus_template, filter_cache, filter_args)
+    )
 
-        if ss_users_list or no_ss_users_list:
-            solvers_st = set(dataset.solvers[level])
-            if not all(user in solvers_st for user in ss_users_list):
-                continue
-            if any(user in solvers_st for user in no_ss_users_list):
-                continue
 
-        result.append(level)
+def _atlas_filter_bitset(
+    dataset: DatasetManager,
+    nexus_template: NexusTemplate,
+    filter_cache: Optional[FilterCache],
+    filter_args: Dict[str, Any],
+) -> Bitset:
+    """Return the bitset of the levels selected by atlas_filter_levels."""
+    spec = AtlasFilterSpec.from_args(**filter_args)
+    return _cached_filter(
+        filter_cache,
+        dataset,
+        nexus_template,
+        spec,
+        lambda: _atlas_filter_spec(dataset, spec),
+    )
 
-    return result
+
+def _atlas_filter_spec(dataset: DatasetManager, spec: AtlasFilterSpec) -> Bitset:
+    """Return the bitset of the levels of `dataset` matching `spec`."""
+    index = dataset.level_index()
+    candidates = index.filter_properties(dict(spec.properties))
+    candidates &= index.bitsets["has_atlas_id"] & ~index.bitsets["banned"]
+    candidates &= index.range_bitset(
+        "ss_count", spec.min_ss, None if spec.max_ss == -1 else spec.max_ss
+    )
+    candidates &= index.range_bitset(
+        "fastest_time",
+        spec.min_time_ms,
+        None if spec.max_time_ms == -1 else spec.max_time_ms,
+    )
+    if spec.ss_users or spec.no_ss_users:
+        candidates &= index.solvers_bitset(spec.ss_users, spec.no_ss_users)
+    if spec.required_authors or spec.blocked_authors:
+        candidates &= index.authors_bitset(spec.required_authors, spec.blocked_authors)
+    return candidates
 
 
 def atlas_randomize(
@@ -220,16 +303,27 @@ def atlas_randomize(
     min_difficulty="0",
     max_difficulty="1000",
     rand_doors="",
+    filter_cache: Optional[FilterCache] = None,
     **filter_args,
 ) -> RandomizerData:
     """Create all randomizer metadata. Decides what levels to use,
     what door types to put in front of those levels, and what key
     type each of those levels should produce.
+
+    The candidate levels are ordered by difficulty through the dataset's
+    precomputed rank order and only the selected difficulty window is
+    materialized. The random number generator is consumed exactly as when
+    sorting the candidates, so every (dataset, args, seed) keeps producing
+    the same nexus.
     """
-    ord_levels = sorted(
-        atlas_filter_levels(dataset, nexus_template, **filter_args),
-        key=lambda level: dataset.level_ranks[level],
+    index = dataset.level_index()
+    candidates = _atlas_filter_bitset(
+        dataset, nexus_template, filter_cache, filter_args
     )
+    unranked = candidates & ~index.bitsets["ranked"]
+    if unranked.any():
+        raise KeyError(index.levels(unranked)[0])
+    ord_positions = index.ranked_positions(candidates)
 
     mn_diff, mx_diff = 0.0, 1.0
     try:
@@ -242,32 +336,32 @@ def atlas_randomize(
         pass
 
     # Figure out what range of levels to include
-    ind_start = int(round(mn_diff * len(ord_levels)))
-    ind_end = int(round(mx_diff * len(ord_levels)))
-    ind_start = max(0, min(len(ord_levels), ind_start))
-    ind_end = max(0, min(len(ord_levels), ind_end))
+    num_candidates = len(ord_positions)
+    ind_start = int(round(mn_diff * num_candidates))
+    ind_end = int(round(mx_diff * num_candidates))
+    ind_start = max(0, min(num_candidates, ind_start))
+    ind_end = max(0, min(num_candidates, ind_end))
     if ind_end < ind_start:
         ind_start = ind_end
 
     num_levels = len(nexus_template.level_doors)
     while ind_end - ind_start < num_levels:
-        if ind_end < len(ord_levels):
+        if ind_end < num_candidates:
             ind_end += 1
         if ind_start > 0:
             ind_start -= 1
 
     # Select range of possible levels
-    ord_levels = ord_levels[ind_start:ind_end]
+    ord_levels = [
+        index.level_ids[ind] for ind in ord_positions[ind_start:ind_end].tolist()
+    ]
 
     # Pick the first 64 of those levels
     rng.shuffle(ord_levels)
     ord_levels = ord_levels[:num_levels]
 
-    doors = []
-    keys = []
-    for door_id in nexus_template.level_doors:
-        doors.append(nexus_template.data["doors"][door_id]["door"])
-        keys.append(nexus_template.data["doors"][door_id]["key_get"])
+    doors = list(nexus_template.level_door_types)
+    keys = list(nexus_template.level_key_types)
 
     levels = ["" for _ in range(num_levels)]
 
@@ -275,10 +369,7 @@ def atlas_randomize(
     ord_levels.sort(key=lambda level: dataset.level_ranks.get(level, 0.0))
 
     offset = 0
-    for key_type in range(4):
-        door_indexes = [
-            ind for ind, door in enumerate(doors) if DOOR_INFO[door][1] == key_type
-        ]
+    for door_indexes in nexus_template.key_door_indexes:
         chunk_levels = ord_levels[offset : offset + len(door_indexes)]
         offset += len(door_indexes)
 
@@ -300,27 +391,65 @@ def atlas_randomize(
     )
 
 
+@dataclasses.dataclass(frozen=True)
+class StockFilterSpec:  # pylint: disable=too-many-instance-attributes
+    """Arguments of stock_filter_levels, hashable so they can key a
+    FilterCache.
+    """
+
+    builtin_filter: str = "y"
+    stock_filter: str = ""
+    forest_filter: str = ""
+    mansion_filter: str = ""
+    city_filter: str = ""
+    lab_filter: str = ""
+    tutorials_filter: str = ""
+    difficults_filter: str = ""
+    yotta_filter: str = "n"
+    old_tutorial_filter: str = "n"
+    devclip_filter: str = "n"
+    infini_filter: str = "n"
+
+    @classmethod
+    def from_args(cls, **args) -> "StockFilterSpec":
+        """Pick the stock filter arguments out of a request's arguments."""
+        return cls(
+            **{
+                field.name: args[field.name]
+                for field in dataclasses.fields(cls)
+                if field.name in args
+            }
+        )
+
+
 def stock_filter_levels(
-    dataset: DatasetManager,  # pylint: disable=unused-argument
+    dataset: DatasetManager,
     nexus_template: NexusTemplate,
     *,
-    builtin_filter: str = "y",
-    stock_filter: str = "",
-    forest_filter: str = "",
-    mansion_filter: str = "",
-    city_filter: str = "",
-    lab_filter: str = "",
-    tutorials_filter: str = "",
-    difficults_filter: str = "",
-    yotta_filter: str = "n",
-    old_tutorial_filter: str = "n",
-    devclip_filter: str = "n",
-    infini_filter: str = "n",
-    **_,
+    filter_cache: Optional[FilterCache] = None,
+    **filter_args,
 ) -> List[str]:
     """
     Return a list of candidate levels after applying the requested constraints.
+    The constraints are the fields of StockFilterSpec. If `filter_cache` is
+    given results are memoized in it.
     """
+    spec = StockFilterSpec.from_args(**filter_args)
+    return list(
+        _cached_filter(
+            filter_cache,
+            dataset,
+            nexus_template,
+            spec,
+            lambda: tuple(_stock_filter_spec(nexus_template, spec)),
+        )
+    )
+
+
+def _stock_filter_spec(
+    nexus_template: NexusTemplate, spec: StockFilterSpec
+) -> List[str]:
+    """Return the stock and template levels matching `spec`."""
     if isinstance(nexus_template, LinearNexusTemplate):
         levels_builtin = set()
     else:
@@ -339,18 +468,18 @@ def stock_filter_levels(
     result = []
     for level in levels_builtin | levels_stock:
         props = (
-            (builtin_filter, level in levels_builtin),
-            (stock_filter, level in levels_stock),
-            (forest_filter, level in levels_forest),
-            (mansion_filter, level in levels_mansion),
-            (city_filter, level in levels_city),
-            (lab_filter, level in levels_lab),
-            (tutorials_filter, level in levels_tutorials),
-            (difficults_filter, level in levels_difficults),
-            (yotta_filter, level == "yottadifficult"),
-            (old_tutorial_filter, level == "tutorial0"),
-            (devclip_filter, level == "devclip"),
-            (infini_filter, level == "exec func ruin user"),
+            (spec.builtin_filter, level in levels_builtin),
+            (spec.stock_filter, level in levels_stock),
+            (spec.forest_filter, level in levels_forest),
+            (spec.mansion_filter, level in levels_mansion),
+            (spec.city_filter, level in levels_city),
+            (spec.lab_filter, level in levels_lab),
+            (spec.tutorials_filter, level in levels_tutorials),
+            (spec.difficults_filter, level in levels_difficults),
+            (spec.yotta_filter, level == "yottadifficult"),
+            (spec.old_tutorial_filter, level == "tutorial0"),
+            (spec.devclip_filter, level == "devclip"),
+            (spec.infini_filter, level == "exec func ruin user"),
         )
 
         require_props = [prop[1] for prop in props if prop[0] == "y"]
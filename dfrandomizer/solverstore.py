@@ -0,0 +1,148 @@
+"""
+Compact binary storage for the level to solver mapping.
+
+The store is laid out CSR-style so that it can be memory-mapped and served
+without materializing a Python int for every solver:
+
+    magic          8 bytes  b"DFSOLV\\x00\\x01"
+    num_levels     uint32
+    names_len      uint32
+    names          names_len bytes, JSON list of level IDs (UTF-8)
+    padding        to an 8 byte boundary
+    offsets        int64[num_levels + 1]
+    players        int32[offsets[num_levels]]
+
+All integers are little endian. The solvers of the i-th level are
+players[offsets[i]:offsets[i + 1]]. Player IDs must fit in a signed 32-bit
+int.
+"""
+import array
+import json
+import mmap
+import struct
+import sys
+from typing import Iterator, Mapping, Sequence, Union, overload
+
+from .util import open_and_swap
+
+MAGIC = b"DFSOLV\x00\x01"
+HEADER = struct.Struct("<8sII")
+
+
+def write_solver_store(path: str, solvers: Mapping[str, Sequence[int]]) -> None:
+    """Atomically write `solvers` to `path` in the compact store format."""
+    names = json.dumps(list(solvers)).encode()
+
+    offsets = array.array("q", [0])
+    players = array.array("i")
+    for level, level_solvers in solvers.items():
+        try:
+            players.extend(level_solvers)
+        except OverflowError as exc:
+            raise ValueError(
+                f"solvers of {level!r} include a player ID outside the 32-bit "
+                "range of the solver store"
+            ) from exc
+        offsets.append(len(players))
+
+    if sys.byteorder != "little":
+        offsets.byteswap()
+        players.byteswap()
+
+    with open_and_swap(path, "wb") as fout:
+        fout.write(HEADER.pack(MAGIC, len(solvers), len(names)))
+        fout.write(names)
+        fout.write(b"\0" * (-(HEADER.size + len(names)) % 8))
+        fout.write(offsets.tobytes())
+        fout.write(players.tobytes())
+
+
+class SolverList(Sequence[int]):
+    """
+    Read-only sequence of the solver player IDs of one level, referencing
+    the mapped store directly. It compares equal to any other sequence of
+    the same player IDs, such as the lists read from an older solvers.json.
+    """
+
+    __slots__ = ("players",)
+
+    def __init__(self, players: Sequence[int]) -> None:
+        self.players = players
+
+    @overload
+    def __getitem__(self, ind: int) -> int:
+        ...
+
+    @overload
+    def __getitem__(self, ind: slice) -> "SolverList":
+        ...
+
+    def __getitem__(self, ind: Union[int, slice]) -> Union[int, "SolverList"]:
+        if isinstance(ind, slice):
+            return SolverList(self.players[ind])
+        return self.players[ind]
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self.players)
+
+    def __len__(self) -> int:
+        return len(self.players)
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Sequence) or isinstance(other, (str, bytes)):
+            return NotImplemented
+        return len(self) == len(other) and all(
+            player == other_player for player, other_player in zip(self, other)
+        )
+
+    __hash__ = None  # type: ignore
+
+    def __repr__(self) -> str:
+        return f"SolverList({list(self.players)!r})"
+
+
+class SolverStore(Mapping[str, Sequence[int]]):
+    """
+    Read-only mapping of level IDs to solver player IDs backed by a
+    memory-mapped solver store. Values are SolverLists that reference the
+    mapped file directly.
+    """
+
+    def __init__(self, path: str) -> None:
+        with open(path, "rb") as fstore:
+            self.mmap = mmap.mmap(fstore.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, num_levels, names_len = HEADER.unpack_from(self.mmap, 0)
+        if magic != MAGIC:
+            raise ValueError("not a solver store")
+
+        names_start = HEADER.size
+        offsets_start = names_start + names_len + (-(names_start + names_len) % 8)
+        players_start = offsets_start + 8 * (num_levels + 1)
+
+        names = json.loads(self.mmap[names_start : names_start + names_len])
+        self.index = {name: ind for ind, name in enumerate(names)}
+
+        view = memoryview(self.mmap)
+        self.offsets: Sequence[int] = view[offsets_start:players_start].cast("q")
+        self.players: Sequence[int] = view[players_start:].cast("i")
+        if sys.byteorder != "little":
+            # Swap into native order; this gives up zero-copy loading on
+            # big endian hosts but keeps the on-disk format portable.
+            self.offsets = array.array("q", self.offsets)
+            self.offsets.byteswap()
+            self.players = array.array("i", self.players)
+            self.players.byteswap()
+
+    def __getitem__(self, level: str) -> SolverList:
+        ind = self.index[level]
+        return SolverList(self.players[self.offsets[ind] : self.offsets[ind + 1]])
+
+    def __contains__(self, level: object) -> bool:
+        return level in self.index
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.index)
+
+    def __len__(self) -> int:
+        return len(self.index)
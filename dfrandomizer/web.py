@@ -15,6 +15,7 @@ from flask import Flask, Response, request, render_template
 from .dataset import DatasetManager
 from .nexus_templates import NexusTemplate, load_all_templates
 from .randomizer import (
+    FilterCache,
     atlas_filter_levels,
     atlas_randomize,
     stock_filter_levels,
@@ -73,6 +74,9 @@ LEVEL_FILTERS = {
     "stock": stock_filter_levels,
 }
 
+# Number of author names returned by the author autocomplete endpoint.
+AUTHOR_COMPLETIONS = 10
+
 GENERATORS = {
     "atlas": atlas_randomize,
     "stock": stock_randomize,
@@ -127,8 +131,10 @@ class FlaskRandomizer:
             "/generate-link", view_func=self.generate_link_view, methods=["POST"]
         )
         self.app.add_url_rule("/generate", view_func=self.generate_view)
+        self.app.add_url_rule("/authors", view_func=self.authors_view)
 
         self.datasets: Dict[int, DatasetManager] = {}
+        self.filter_cache = FilterCache()
         self.nexus_templates: Dict[str, NexusTemplate] = {}
         self.default_dataset_id = 0
         self.last_update_time = time.time()
@@ -139,6 +145,7 @@ class FlaskRandomizer:
         information.
         """
         self.datasets.clear()
+        self.filter_cache.clear()
         if self.old_datasets_dir:
             for ds_path in os.listdir(self.old_datasets_dir):
                 dataset = DatasetManager(os.path.join(self.old_datasets_dir, ds_path))
@@ -187,6 +194,25 @@ class FlaskRandomizer:
             return "updated"
         return "sleepy"
 
+    def authors_view(self):
+        """Return up to AUTHOR_COMPLETIONS author names starting with the
+        "prefix" argument as JSON, used to autocomplete the author filters.
+        """
+        try:
+            dataset = self.datasets[int(request.args.get("dataset-id", ""))]
+        except (KeyError, ValueError):
+            dataset = self.datasets[self.default_dataset_id]
+
+        names = dataset.level_index().author_index.complete(
+            request.args.get("prefix", "").strip(), AUTHOR_COMPLETIONS
+        )
+        return Response(
+            json.dumps(names),
+            headers={
+                "Content-Type": "application/json; charset=utf-8",
+            },
+        )
+
     @handle_error
     def generate_link_view(self):
         """Verify and report the number of available levels and yield a
@@ -225,11 +251,9 @@ class FlaskRandomizer:
             **{key.replace("-", "_"): val for key, val in new_args.items()},
         )
 
-        levels = LEVEL_FILTERS[args["type"]](
-            dataset,
-            nexus_template,
-            **{key.replace("-", "_"): val for key, val in new_args.items()},
-        )
+        filter_args = {key.replace("-", "_"): val for key, val in new_args.items()}
+        filter_args["filter_cache"] = self.filter_cache
+        levels = LEVEL_FILTERS[args["type"]](dataset, nexus_template, **filter_args)
         if args["type"] != "custom" and len(levels) < len(nexus_template.level_doors):
             return Response(
                 f"{len(levels)} matching levels, need {len(nexus_template.level_doors)}",
@@ -284,12 +308,9 @@ class FlaskRandomizer:
             **{key.replace("-", "_"): val for key, val in args.items()},
         )
 
-        nexus_data = generator(
-            rng,
-            dataset,
-            nexus_template,
-            **{key.replace("-", "_"): val for key, val in args.items()},
-        )
+        generator_args = {key.replace("-", "_"): val for key, val in args.items()}
+        generator_args["filter_cache"] = self.filter_cache
+        nexus_data = generator(rng, dataset, nexus_template, **generator_args)
 
         randomizer_hash = hashlib.sha256(
             json.dumps(nexus_data.as_json(), sort_keys=True).encode()